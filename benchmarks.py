@@ -0,0 +1,379 @@
+"""
+Benchmarks of the board operations, computer moves and Hall of Fame
+storage of Connect Four.
+
+The positions are built from a fixed seed and the storage runs on a
+local fake sheet, so results are reproducible and can be compared with
+a saved baseline. Run 'python benchmarks.py --help' for the options.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from run import (
+    COMPUTER_PIECE, PLAYER_PIECE, TRANSPOSITION_TABLE, Board,
+    HallOfFameCache, SQLitePlayerStore, check_for_blocking_move,
+    get_computer_move, get_opening_book,
+)
+from tests.fake_sheet import FakeSheet
+
+
+# Position sets
+
+BENCHMARK_POSITIONS = 16
+BENCHMARK_FILL = {"empty": 0.0, "midgame": 0.4, "near-full": 0.85}
+
+
+def benchmark_positions(seed=0, count=BENCHMARK_POSITIONS, rows=6, cols=7,
+                        connect=4):
+    """
+    Builds the fixed position sets the benchmarks run on.
+
+    Each set holds 'count' boards filled to the share of cells given in
+    'BENCHMARK_FILL' by random moves that never complete a line, so
+    every position is still being played. The same seed always gives
+    the same positions. A set with no moves holds a single board,
+    because all empty boards are the same.
+
+    Args:
+        seed (int): Seed of the random moves.
+        count (int): Number of boards per set.
+        rows (int): Number of rows of the boards.
+        cols (int): Number of columns of the boards.
+        connect (int): Number of pieces in a row needed to win.
+
+    Returns:
+        dict: Maps "empty", "midgame" and "near-full" to lists of boards.
+    """
+    rng = random.Random(seed)
+    pieces = (PLAYER_PIECE, COMPUTER_PIECE)
+    positions = {}
+    for name, fill in BENCHMARK_FILL.items():
+        moves = int(rows * cols * fill)
+        boards = []
+        while len(boards) < (count if moves else 1):
+            board = Board(rows, cols, connect)
+            for turn in range(moves):
+                columns = [col for col in range(cols)
+                           if board.is_valid_location(col)]
+                rng.shuffle(columns)
+                for col in columns:
+                    row = board.get_next_open_row(col)
+                    board.add_piece(row, col, pieces[turn % 2])
+                    if not board.check_win_at(row, col):
+                        break
+                    board.undo_piece()
+                else:
+                    break
+            else:
+                boards.append(board)
+        positions[name] = boards
+    return positions
+
+
+def benchmark_players(count=1000):
+    """
+    Builds the Hall of Fame rows the storage benchmarks start from.
+
+    Args:
+        count (int): Number of players.
+
+    Returns:
+        list: Sheet values with a header row and 'count' player rows.
+    """
+    return ([["player_name", "games_won", "games_lost"]]
+            + [[f"Player {number}", number % 17, number % 11]
+               for number in range(count)])
+
+
+def measure_benchmark(operation, items, min_time=0.2, requests=None,
+                      setup=None):
+    """
+    Measures how fast an operation runs and how much memory it takes.
+
+    One untimed round warms up caches such as the transposition table,
+    so every timed round does the same work. The operation is then run
+    on every item in rounds, doubling the number of rounds until they
+    take at least 'min_time'. One more round is traced with
+    'tracemalloc' to find the memory it allocates and counts the API
+    requests it sends.
+
+    With 'setup', it is called before every call of the operation and
+    left out of the time and memory, so each call starts cold, for
+    example with an empty transposition table.
+
+    Args:
+        operation (callable): Called once per item.
+        items (list): The inputs of the operation.
+        min_time (float): Minimum seconds to time.
+        requests (callable): Returns the number of API requests sent so
+        far, or None if the operation sends none.
+        setup (callable): Called without arguments before every call of
+        the operation, or None.
+
+    Returns:
+        dict: 'ops', 'ops_per_sec' and 'peak_bytes', the most memory
+        allocated at once during one round, or during one call with
+        'setup', and 'requests_per_op' if 'requests' is given.
+    """
+    for item in items:
+        if setup:
+            setup()
+        operation(item)
+    rounds = 1
+    while True:
+        elapsed = 0.0
+        if setup:
+            for _ in range(rounds):
+                for item in items:
+                    setup()
+                    start = time.perf_counter()
+                    operation(item)
+                    elapsed += time.perf_counter() - start
+        else:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for item in items:
+                    operation(item)
+            elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        rounds *= 2
+    ops = rounds * len(items)
+    sent = requests() if requests else 0
+    peak = 0
+    if setup:
+        for item in items:
+            setup()
+            tracemalloc.start()
+            try:
+                operation(item)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+    else:
+        tracemalloc.start()
+        try:
+            for item in items:
+                operation(item)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    result = {"ops": ops, "ops_per_sec": ops / elapsed, "peak_bytes": peak}
+    if requests:
+        result["requests_per_op"] = (requests() - sent) / len(items)
+    return result
+
+
+def measure_table(operation, boards):
+    """
+    Measures how well the transposition table serves computer moves.
+
+    Every move starts with an empty table, as in the timed benchmark,
+    and the table's counters are added up over all boards.
+
+    Args:
+        operation (callable): Plays a computer move on a board.
+        boards (list): The positions.
+
+    Returns:
+        dict: 'tt_probes_per_op' and 'tt_hit_rate', or nothing if the
+        moves never used the table.
+    """
+    probes = hits = 0
+    for board in boards:
+        TRANSPOSITION_TABLE.clear()
+        operation(board)
+        probes += TRANSPOSITION_TABLE.probes
+        hits += TRANSPOSITION_TABLE.hits
+    TRANSPOSITION_TABLE.clear()
+    if not probes:
+        return {}
+    return {"tt_probes_per_op": probes / len(boards),
+            "tt_hit_rate": hits / probes}
+
+
+def run_benchmarks(seed=0, min_time=0.2, levels=("easy", "medium")):
+    """
+    Runs every benchmark on fixed positions and an offline Hall of Fame.
+
+    Board operations run on each position set. Computer moves start
+    with an empty transposition table every time, so cached results of
+    earlier rounds cannot hide a slower search. The storage benchmarks
+    use a 'FakeSheet' or an in-memory SQLite database, so they need no
+    network access, and also report the sheet requests per operation.
+
+    Args:
+        seed (int): Seed of the positions and of the easy computer.
+        min_time (float): Minimum seconds to time each benchmark.
+        levels (tuple): Difficulty levels to time 'get_computer_move'
+        for.
+
+    Returns:
+        dict: 'meta' describing the run and 'results' mapping benchmark
+        names to the measurements of 'measure_benchmark'.
+    """
+    positions = benchmark_positions(seed)
+    results = {}
+    for set_name, boards in positions.items():
+        board_ops = {
+            "check_win": lambda board: (board.check_win(PLAYER_PIECE),
+                                        board.check_win(COMPUTER_PIECE)),
+            "get_next_open_row": lambda board: [
+                board.get_next_open_row(col) for col in range(board.cols)
+                if board.is_valid_location(col)],
+            "check_for_blocking_move": lambda board: check_for_blocking_move(
+                board, COMPUTER_PIECE),
+        }
+        for level in levels:
+            board_ops[f"computer_move.{level}"] = (
+                lambda board, level=level: get_computer_move(
+                    board, COMPUTER_PIECE, level))
+        for op_name, operation in board_ops.items():
+            random.seed(seed)
+            TRANSPOSITION_TABLE.clear()
+            setup = (TRANSPOSITION_TABLE.clear
+                     if op_name.startswith("computer_move.") else None)
+            result = results[f"{op_name}[{set_name}]"] = measure_benchmark(
+                operation, boards, min_time, setup=setup)
+            if setup:
+                result.update(measure_table(operation, boards))
+
+    players = benchmark_players()
+    names = [row[0] for row in players[1:]] + ["Nobody"] * 100
+    sheet = FakeSheet(players)
+    cache = HallOfFameCache(sheet)
+    cache.load()
+    rows = [cache.find(name)[0] for name in names[:len(players) - 1]]
+
+    def flush_changes(row):
+        cache.increment(row, True)
+        cache.flush()
+
+    sqlite_store = SQLitePlayerStore(":memory:")
+    sqlite_ids = [sqlite_store.add(name) for name in names[:100]]
+    storage_ops = {
+        "hof.load": (lambda row: HallOfFameCache(sheet).load(), rows[:20]),
+        "hof.find": (cache.find, names),
+        "hof.increment": (lambda row: cache.increment(row, True), rows),
+        "hof.flush": (flush_changes, rows[:100]),
+        "sqlite.find": (sqlite_store.find, names[:100]),
+        "sqlite.increment": (lambda player_id: sqlite_store.increment(
+            player_id, True), sqlite_ids),
+    }
+    for op_name, (operation, items) in storage_ops.items():
+        results[op_name] = measure_benchmark(
+            operation, items, min_time,
+            (lambda: sheet.requests) if op_name.startswith("hof.") else None)
+    sqlite_store.connection.close()
+
+    return {
+        "meta": {
+            "seed": seed,
+            "positions": {name: len(boards)
+                          for name, boards in positions.items()},
+            "python": sys.version.split()[0],
+            "opening_book": get_opening_book() is not None,
+            "transposition_table_size": TRANSPOSITION_TABLE.size,
+        },
+        "results": results,
+    }
+
+
+def compare_benchmarks(report, baseline, tolerance=0.1):
+    """
+    Compares a benchmark report with a stored baseline.
+
+    Args:
+        report (dict): The report of 'run_benchmarks'.
+        baseline (dict): An earlier report.
+        tolerance (float): The share by which a benchmark may be slower
+        than the baseline before it counts as a regression.
+
+    Returns:
+        list: (name, change) pairs of the regressed benchmarks, where
+        'change' is the relative change of 'ops_per_sec'.
+    """
+    regressions = []
+    for name, result in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before["ops_per_sec"]:
+            continue
+        change = result["ops_per_sec"] / before["ops_per_sec"] - 1
+        result["change"] = change
+        if change < -tolerance:
+            regressions.append((name, change))
+    return regressions
+
+
+def print_benchmark_report(report):
+    """
+    Prints the report of 'run_benchmarks' as a table.
+
+    Args:
+        report (dict): The report, with a 'change' per benchmark if it
+        was compared with a baseline.
+    """
+    print(f"{'benchmark':<40}{'ops/s':>12}{'peak KiB':>10}{'change':>9}"
+          f"{'TT hits':>9}")
+    for name, result in report["results"].items():
+        change = result.get("change")
+        change = f"{change:+.1%}" if change is not None else ""
+        hit_rate = result.get("tt_hit_rate")
+        hit_rate = f"{hit_rate:.1%}" if hit_rate is not None else ""
+        print(f"{name:<40}{result['ops_per_sec']:>12.0f}"
+              f"{result['peak_bytes'] / 1024:>10.1f}{change:>9}"
+              f"{hit_rate:>9}")
+    size = report["meta"].get("transposition_table_size")
+    if size:
+        print(f"Transposition table: {size} slots")
+
+
+# Command line
+
+
+def main(argv=None):
+    """
+    Runs the benchmarks, prints them and optionally saves them or
+    compares them with a baseline.
+
+    Args:
+        argv (list): Command line arguments, defaults to 'sys.argv'.
+    """
+    parser = argparse.ArgumentParser(
+        description="Connect Four benchmarks")
+    parser.add_argument(
+        "output", nargs="?", metavar="FILE",
+        help="save the report to FILE as JSON")
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="seed of the positions and of the easy computer (default 0)")
+    parser.add_argument(
+        "--baseline", metavar="FILE",
+        help="compare with a saved report and fail on regressions")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1,
+        help="slowdown --baseline accepts, as a share (default 0.1)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.seed)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = compare_benchmarks(
+                report, json.load(baseline_file), args.tolerance)
+    print_benchmark_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=2)
+    if regressions:
+        parser.exit(1, f"{len(regressions)} benchmark(s) slower than the "
+                       f"baseline\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,27 @@
 const Pty = require('node-pty');
 const fs = require('fs');
 
+// Warm run.py processes kept ready for new connections
+const POOL_SIZE = parseInt(process.env.PYTHON_POOL_SIZE || '2', 10);
+
+// Seconds a process beyond POOL_SIZE may stay idle before it is stopped
+const IDLE_TIMEOUT = parseInt(process.env.PYTHON_POOL_IDLE_TIMEOUT || '300', 10) * 1000;
+
+// Markers run.py --pooled writes when it is ready and when a session ends
+const SESSION_READY = '\x1b]connect-four;ready\x07';
+const SESSION_END = '\x1b]connect-four;session-end\x07';
+
+const idle = [];
+const waiting = [];
+let starting = 0;
+
 exports.install = function () {
 
     ROUTE('/');
     WEBSOCKET('/', socket, ['raw']);
 
+    refill();
+
 };
 
 function socket() {
@@ -14,39 +30,165 @@ function socket() {
     this.autodestroy();
 
     this.on('open', function (client) {
+        const worker = idle.pop();
+        if (worker) {
+            attach(worker, client);
+        } else {
+            waiting.push(client);
+        }
+        refill();
+    });
 
-        // Spawn terminal
-        client.tty = Pty.spawn('python3', ['run.py'], {
+    this.on('close', function (client) {
+        const index = waiting.indexOf(client);
+        if (index !== -1) {
+            waiting.splice(index, 1);
+        }
+        if (client.worker) {
+            // The session did not end cleanly, so the process is not reused
+            const worker = client.worker;
+            worker.client = null;
+            client.worker = null;
+            client.tty = null;
+            worker.tty.kill(9);
+            console.log("Process killed and terminal unloaded");
+        }
+    });
+
+    this.on('message', function (client, msg) {
+        client.tty && client.tty.write(msg);
+    });
+}
+
+// Starts warm processes until the pool and all waiting clients are covered
+function refill() {
+    while (idle.length + starting < POOL_SIZE + waiting.length) {
+        spawn();
+    }
+}
+
+function spawn() {
+
+    const worker = {
+        tty: Pty.spawn('python3', ['run.py', '--pooled'], {
             name: 'xterm-color',
             cols: 80,
             rows: 24,
             cwd: process.env.PWD,
             env: process.env
-        });
+        }),
+        client: null,
+        started: false,
+        timer: null,
+        pending: ''
+    };
+    starting++;
 
-        client.tty.on('exit', function (code, signal) {
+    worker.tty.on('exit', function (code, signal) {
+        if (!worker.started) {
+            // Failed before it was ready; wait before trying again
+            starting--;
+            setTimeout(refill, 5000);
+        }
+        release(worker);
+        const index = idle.indexOf(worker);
+        if (index !== -1) {
+            idle.splice(index, 1);
+        }
+        if (worker.client) {
+            const client = worker.client;
+            worker.client = null;
+            client.worker = null;
             client.tty = null;
             client.close();
             console.log("Process killed");
-        });
-
-        client.tty.on('data', function (data) {
-            client.send(data);
-        });
-
+        }
+        if (worker.started) {
+            refill();
+        }
     });
 
-    this.on('close', function (client) {
-        if (client.tty) {
-            client.tty.kill(9);
+    worker.tty.on('data', function (data) {
+        // Hold back the end of a marker split across chunks until the rest arrives
+        data = worker.pending + data;
+        const keep = partialMarker(data);
+        worker.pending = data.substring(data.length - keep);
+        data = data.substring(0, data.length - keep);
+        if (worker.client) {
+            const end = data.indexOf(SESSION_END);
+            if (end === -1) {
+                worker.client.send(data);
+                return;
+            }
+            const client = worker.client;
+            client.send(data.substring(0, end));
+            worker.client = null;
+            client.worker = null;
             client.tty = null;
-            console.log("Process killed and terminal unloaded");
+            client.close();
+            data = data.substring(end + SESSION_END.length);
+        }
+        if (data.indexOf(SESSION_READY) !== -1) {
+            if (!worker.started) {
+                worker.started = true;
+                starting--;
+            }
+            ready(worker);
         }
     });
+}
 
-    this.on('message', function (client, msg) {
-        client.tty && client.tty.write(msg);
+// Number of characters at the end of data that could start a marker
+function partialMarker(data) {
+    let keep = 0;
+    [SESSION_READY, SESSION_END].forEach(function (marker) {
+        for (let length = Math.min(data.length, marker.length - 1); length > keep; length--) {
+            if (marker.startsWith(data.substring(data.length - length))) {
+                keep = length;
+                break;
+            }
+        }
     });
+    return keep;
+}
+
+// Hands a ready process to a waiting client or keeps it in the pool
+function ready(worker) {
+    const client = waiting.shift();
+    if (client) {
+        attach(worker, client);
+        return;
+    }
+    idle.push(worker);
+    expire(worker);
+}
+
+function attach(worker, client) {
+    release(worker);
+    worker.client = client;
+    client.worker = worker;
+    client.tty = worker.tty;
+    worker.tty.write('\r');
+}
+
+// Stops processes that stay idle while the pool is larger than POOL_SIZE
+function expire(worker) {
+    worker.timer = setTimeout(function () {
+        worker.timer = null;
+        if (idle.length > POOL_SIZE) {
+            idle.splice(idle.indexOf(worker), 1);
+            worker.tty.kill(9);
+        } else {
+            expire(worker);
+        }
+    }, IDLE_TIMEOUT);
+}
+
+function release(worker) {
+    if (worker.timer) {
+        clearTimeout(worker.timer);
+        worker.timer = null;
+    }
 }
 
 if (process.env.CREDS != null) {
@@ -57,4 +199,4 @@ if (process.env.CREDS != null) {
             socket.emit("console_output", "Error saving credentials: " + err);
         }
     });
-}
\ No newline at end of file
+}
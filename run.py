@@ -1,13 +1,25 @@
 # Library imports
 
-import gspread
-from google.oauth2.service_account import Credentials
-from gspread.exceptions import SpreadsheetNotFound, APIError, WorksheetNotFound
 import random
-import pyfiglet
 from colorama import just_fix_windows_console
 from colorama import Fore, Back, Style
+import abc
+import argparse
+import atexit
+import bisect
+import functools
+import json
+import math
+import mmap
+import multiprocessing
 import os
+import shutil
+import signal
+import sqlite3
+import struct
+import subprocess
+import sys
+import threading
 import time
 
 just_fix_windows_console()
@@ -18,6 +30,64 @@ just_fix_windows_console()
 is_running = True
 
 
+# Board size and pieces in a row needed to win, see '--rows',
+# '--cols' and '--connect'
+
+BOARD_ROWS = 6
+BOARD_COLS = 7
+CONNECT = 4
+
+
+# Piece codes, stored on the board instead of the colored symbols
+
+EMPTY = 0
+PLAYER_PIECE = 1
+COMPUTER_PIECE = 2
+OPPONENT_PIECE = 3
+
+PIECE_SYMBOLS = {
+    EMPTY: " ",
+    PLAYER_PIECE: Fore.GREEN + "P" + Style.RESET_ALL,
+    COMPUTER_PIECE: Fore.RED + "C" + Style.RESET_ALL,
+    OPPONENT_PIECE: Fore.YELLOW + "O" + Style.RESET_ALL,
+}
+
+
+# Computer difficulty levels
+
+DIFFICULTY_LEVELS = {
+    "easy": {"name": "Easy", "engine": "blocking"},
+    "medium": {"name": "Medium", "engine": "negamax",
+               "depth": 4, "time_limit": 0.5},
+    "hard": {"name": "Hard", "engine": "negamax",
+             "depth": 42, "time_limit": 2.0},
+    "mcts": {"name": "Monte Carlo", "engine": "mcts",
+             "playouts": 4000, "time_limit": 2.0, "processes": None},
+}
+
+# Slots of the transposition table shared by the negamax levels,
+# rounded up to a power of two; see the hit rate in '--profile' and
+# 'benchmarks.py' when tuning it
+
+TRANSPOSITION_TABLE_SIZE = int(os.environ.get("CONNECT_FOUR_TT_SIZE",
+                                              1 << 16))
+
+
+# Opening book
+
+OPENING_BOOK_FILE = "opening_book.bin"
+
+
+# Figlet title cache file, empty to keep titles in memory only
+
+BANNER_CACHE_FILE = os.environ.get("CONNECT_FOUR_BANNER_CACHE", "")
+
+
+# Game record log, one JSON line per game, empty to record nothing
+
+GAME_LOG_FILE = os.environ.get("CONNECT_FOUR_GAME_LOG", "games.jsonl")
+
+
 # API setup
 
 SCOPE = [
@@ -26,15 +96,283 @@ SCOPE = [
     "https://www.googleapis.com/auth/drive",
 ]
 
-CREDS = Credentials.from_service_account_file("creds.json")
-SCOPED_CREDS = CREDS.with_scopes(SCOPE)
-GSPREAD_CLIENT = gspread.authorize(SCOPED_CREDS)
-SHEET = GSPREAD_CLIENT.open("connect_four")
-HOF_SHEET = SHEET.worksheet("hof")
+# Profiling report file, see '--profile'; unset to turn profiling off
+
+PROFILE_FILE = os.environ.get("CONNECT_FOUR_PROFILE")
+
+# Player storage: "sheets" (Google Sheets), "sqlite[:path]" or "memory"
+
+STORAGE = os.environ.get("CONNECT_FOUR_STORAGE", "sheets")
+SQLITE_FILE = "hof.sqlite3"
+
+# Google Sheets requests allowed per minute, how many of them may be
+# sent at once, and the file that keeps Hall of Fame changes until the
+# sheet can take them
+
+SHEETS_REQUESTS_PER_MINUTE = 60
+SHEETS_BURST = 5
+HOF_QUEUE_FILE = os.environ.get("CONNECT_FOUR_HOF_QUEUE", "hof_queue.jsonl")
 
 
 # Functions and classes
 
+# Profiling
+
+
+class Profiler:
+    """
+    Collects timings and counters of the game's hot paths.
+
+    Profiling is off until 'enable' is called, and then costs one
+    attribute check per profiled call. Timings are kept per operation
+    and summarized as percentiles in 'report'.
+
+    Attributes:
+        enabled (bool): True while measurements are collected.
+        path (str): JSON file the report is written to, or "" for none.
+        timings (dict): Maps operation names to lists of durations in
+        seconds.
+        counters (dict): Maps counter names to counts.
+        metrics (dict): Maps names to the latest value of measurements
+        that are not counts, such as rates.
+        started (float): 'time.perf_counter()' when profiling began.
+    """
+
+    def __init__(self):
+        """
+        Initializes a disabled profiler.
+        """
+        self.enabled = False
+        self.path = ""
+        self.timings = {}
+        self.counters = {}
+        self.metrics = {}
+        self.started = 0.0
+        self.lock = threading.Lock()
+
+    def enable(self, path=""):
+        """
+        Starts collecting measurements.
+
+        The report is printed at exit and, if 'path' is given, written
+        there as JSON. On systems with SIGUSR1 the report file is also
+        written whenever the process receives that signal.
+
+        Args:
+            path (str): JSON file to write the report to.
+        """
+        if self.enabled:
+            return
+        self.enabled = True
+        self.path = path
+        self.started = time.perf_counter()
+        atexit.register(self.finish)
+        if (hasattr(signal, "SIGUSR1")
+                and threading.current_thread() is threading.main_thread()):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.save())
+
+    def record(self, name, seconds):
+        """
+        Adds one timing of an operation.
+
+        Args:
+            name (str): The operation.
+            seconds (float): How long it took.
+        """
+        with self.lock:
+            self.timings.setdefault(name, []).append(seconds)
+
+    def count(self, name, amount=1):
+        """
+        Increases a counter.
+
+        Args:
+            name (str): The counter.
+            amount (int): How much to add.
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        """
+        Sets a metric, replacing its earlier value.
+
+        Args:
+            name (str): The metric.
+            value (float): The new value.
+        """
+        with self.lock:
+            self.metrics[name] = value
+
+    def report(self):
+        """
+        Summarizes everything measured so far.
+
+        Returns:
+            dict: 'elapsed_s' since profiling began, 'operations' with
+            the call count, total, p50, p95, p99 and maximum in
+            milliseconds per operation, 'counters' and 'metrics'.
+        """
+        with self.lock:
+            timings = {name: list(values)
+                       for name, values in self.timings.items()}
+            counters = dict(self.counters)
+            metrics = dict(self.metrics)
+        operations = {}
+        for name, values in sorted(timings.items()):
+            operations[name] = {
+                "calls": len(values),
+                "total_ms": sum(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": max(values) * 1000,
+            }
+        return {
+            "elapsed_s": time.perf_counter() - self.started,
+            "operations": operations,
+            "counters": dict(sorted(counters.items())),
+            "metrics": dict(sorted(metrics.items())),
+        }
+
+    def save(self, path=None):
+        """
+        Writes the report as JSON.
+
+        Args:
+            path (str): The file to write, defaults to 'path'.
+        """
+        path = path or self.path
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as report_file:
+                json.dump(self.report(), report_file, indent=2)
+        except OSError:
+            pass
+
+    def finish(self):
+        """
+        Saves the report and prints its summary to standard error.
+        """
+        self.save()
+        print_profile_report(self.report(), file=sys.stderr)
+
+
+PROFILER = Profiler()
+
+
+def profiled(name):
+    """
+    Decorator that times every call of a function while profiling.
+
+    Args:
+        name (str): The operation name used in the report.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                PROFILER.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def print_profile_report(report, file=None):
+    """
+    Prints the report of 'Profiler.report' as a table.
+
+    Args:
+        report (dict): The report to print.
+        file: The stream to print to, defaults to standard output.
+    """
+    print(f"Profile of {report['elapsed_s']:.1f}s", file=file)
+    print(f"{'operation':<30}{'calls':>7}{'total ms':>11}{'p50 ms':>10}"
+          f"{'p95 ms':>10}{'p99 ms':>10}", file=file)
+    for name, stats in report["operations"].items():
+        print(f"{name:<30}{stats['calls']:>7}{stats['total_ms']:>11.1f}"
+              f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}", file=file)
+    for name, value in report["counters"].items():
+        print(f"{name:<30}{value:>7}", file=file)
+    for name, value in report.get("metrics", {}).items():
+        value = f"{value:.3f}" if isinstance(value, float) else value
+        print(f"{name:<30}{value:>7}", file=file)
+
+
+class ProfiledSheet:
+    """
+    Wraps a worksheet to count and time every API request made on it.
+
+    Each method call is reported as the operation and counter
+    "sheets.<method>", and all of them add to the "api_requests"
+    counter.
+
+    Attributes:
+        sheet: The wrapped worksheet.
+    """
+
+    def __init__(self, sheet):
+        """
+        Initializes the wrapper.
+
+        Args:
+            sheet: The worksheet to wrap.
+        """
+        self.sheet = sheet
+
+    def __getattr__(self, name):
+        """
+        Returns the attribute of the worksheet, wrapping methods.
+
+        Args:
+            name (str): The attribute name.
+
+        Returns:
+            The attribute, timed and counted if it is callable.
+        """
+        attribute = getattr(self.sheet, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def request(*args, **kwargs):
+            PROFILER.count("api_requests")
+            PROFILER.count(f"sheets.{name}")
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                PROFILER.record(f"sheets.{name}",
+                                time.perf_counter() - start)
+        return request
+
+
+def pause(seconds):
+    """
+    Waits during countdowns, timed as "sleep" while profiling.
+
+    Args:
+        seconds (float): How long to wait.
+    """
+    start = time.perf_counter()
+    time.sleep(seconds)
+    if PROFILER.enabled:
+        PROFILER.record("sleep", time.perf_counter() - start)
+
+
+if PROFILE_FILE is not None:
+    PROFILER.enable(PROFILE_FILE)
+
+
 # Clear screen
 
 
@@ -50,6 +388,7 @@ def clear_screen():
         This function relies on the 'os' module for determining the operating
         system and executing system commands.
     """
+    BOARD_RENDERER.invalidate()
     # For Windows
     if os.name == "nt":
         os.system("cls")
@@ -58,6 +397,103 @@ def clear_screen():
         os.system("clear")
 
 
+# Figlet text
+
+
+class BannerCache:
+    """
+    Renders figlet titles once and keeps the results.
+
+    Titles are cached in memory by font and text. When a file is given
+    the cache is also loaded from and saved to it, so later runs do not
+    render at all and never import 'pyfiglet'.
+
+    Attributes:
+        path (str): The JSON file the cache is kept in, or "" for none.
+        banners (dict): Maps "font:text" keys to rendered titles.
+    """
+
+    def __init__(self, path=""):
+        """
+        Initializes the cache without reading the file yet.
+
+        Args:
+            path (str): The JSON file to keep the cache in, or "" to keep
+            it in memory only.
+        """
+        self.path = path
+        self.banners = None
+
+    def get(self, text, font="bulbhead"):
+        """
+        Returns a rendered title, rendering it on the first request.
+
+        Args:
+            text (str): The title to render.
+            font (str): The figlet font.
+
+        Returns:
+            str: The rendered ASCII art.
+        """
+        if self.banners is None:
+            self.banners = self.load()
+        key = f"{font}:{text}"
+        if key not in self.banners:
+            import pyfiglet
+            self.banners[key] = pyfiglet.figlet_format(text, font=font)
+            self.save()
+        return self.banners[key]
+
+    def load(self):
+        """
+        Reads the cache file.
+
+        Returns:
+            dict: The cached titles, empty if there is no readable file.
+        """
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """
+        Writes the cache file, replacing it in one step so a crash never
+        leaves half a file behind.
+        """
+        if not self.path:
+            return
+        temporary = self.path + ".tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as cache_file:
+                json.dump(self.banners, cache_file)
+            os.replace(temporary, self.path)
+        except OSError:
+            pass
+
+
+BANNER_CACHE = BannerCache(BANNER_CACHE_FILE)
+
+
+def figlet_text(text):
+    """
+    Renders a title as ASCII art in the game's "bulbhead" font.
+
+    Titles come from 'BANNER_CACHE', so each one is rendered at most once
+    and 'pyfiglet' is only imported when a title is not cached yet.
+
+    Args:
+        text (str): The title to render.
+
+    Returns:
+        str: The rendered ASCII art.
+    """
+    return BANNER_CACHE.get(text)
+
+
 # Main function
 
 
@@ -74,17 +510,16 @@ def main_menu():
 
     Note:
         This function uses global variable 'is_running' to control the game
-        loop. It employs 'pyfiglet' for stylized text output and 'colorama'
-        for text coloring. The function 'clear_screen' is used to clear the
-        console before displaying the menu.
+        loop. It employs 'figlet_text' for stylized text output and
+        'colorama' for text coloring. The function 'clear_screen' is used
+        to clear the console before displaying the menu.
     """
     global is_running
     while is_running:
         clear_screen()
         print(
             Fore.YELLOW
-            + pyfiglet.figlet_format
-            ("Welcome to Connect Four", font="bulbhead")
+            + figlet_text("Welcome to Connect Four")
             + Style.RESET_ALL
         )
 
@@ -100,12 +535,15 @@ def main_menu():
         if choice in ["1", "2", "3", "4", "5"]:
             if choice == "1":
                 player_name = get_valid_player_name()
-                start_game(player_name, vs_computer=True)
+                difficulty = get_difficulty()
+                start_game(player_name, vs_computer=True,
+                           difficulty=difficulty)
             elif choice == "2":
                 player1_name = get_valid_player_name("Player 1")
                 while True:
                     player2_name = get_valid_player_name("Player 2")
-                    if player2_name.lower() != player1_name.lower():
+                    if (normalize_name(player2_name)
+                            != normalize_name(player1_name)):
                         break
                     else:
                         err_msg_1 = Fore.RED + "Player 2 cannot have the same"
@@ -120,12 +558,11 @@ def main_menu():
             elif choice == "4":
                 show_hall_of_fame()
             elif choice == "5":
+                flush_player_store()
                 clear_screen()
                 print(
                     Fore.YELLOW
-                    + pyfiglet.figlet_format(
-                        "ByeBye, thank you for playing!", font="bulbhead"
-                    )
+                    + figlet_text("ByeBye, thank you for playing!")
                     + Style.RESET_ALL
                 )
                 is_running = False
@@ -138,7 +575,7 @@ def main_menu():
                     + f"Invalid input. You can retry in {countdown} seconds..."
                     + Style.RESET_ALL, end="\r"
                 )
-                time.sleep(1)
+                pause(1)
                 countdown -= 1
             print(" " * 80, end="\r")
 
@@ -146,7 +583,8 @@ def main_menu():
 # Start game
 
 
-def start_game(player_name, vs_computer=True, player2_name=""):
+def start_game(player_name, vs_computer=True, player2_name="",
+               difficulty="easy"):
     """
     Initiates and manages a game of Connect Four.
 
@@ -159,11 +597,17 @@ def start_game(player_name, vs_computer=True, player2_name=""):
         vs_computer (bool): True to play against the computer, False for
         a two-player game.
         player2_name (str): Name of the second player, if applicable.
+        difficulty (str): Key into 'DIFFICULTY_LEVELS' used for the
+        computer player.
     """
     player1, player2 = prepare_game(player_name, vs_computer, player2_name)
+    players = [player_name, "Computer" if vs_computer else player2_name]
+    pieces = [PLAYER_PIECE, COMPUTER_PIECE if vs_computer else OPPONENT_PIECE]
+    level = difficulty if vs_computer else None
 
-    board = Board()
+    board = Board(BOARD_ROWS, BOARD_COLS, CONNECT)
     board.print_board()
+    started = time.time()
     game_over = False
     turn = 0
 
@@ -171,12 +615,14 @@ def start_game(player_name, vs_computer=True, player2_name=""):
         if turn == 0:
             col = get_player_move(player_name, board)
             if col is None:
+                record_game(board, players, pieces, started, level,
+                            quit_game=True)
                 return
             if board.is_valid_location(col):
                 row = board.get_next_open_row(col)
-                board.add_piece(row, col, Fore.GREEN + "P" + Style.RESET_ALL)
+                board.add_piece(row, col, PLAYER_PIECE)
                 board.print_board()
-                if board.check_win(Fore.GREEN + "P" + Style.RESET_ALL):
+                if board.check_win_at(row, col):
                     print(f"Congratulations, {player_name}! You won!\n")
                     game_over = True
                 else:
@@ -184,23 +630,18 @@ def start_game(player_name, vs_computer=True, player2_name=""):
 
         else:
             if vs_computer:
-                col = get_computer_move(
-                    board, Fore.RED + "C" + Style.RESET_ALL
-                )
+                col = get_computer_move(board, COMPUTER_PIECE, difficulty)
             else:
                 col = get_player_move(player2_name, board)
                 if col is None:
+                    record_game(board, players, pieces, started, level,
+                                quit_game=True)
                     return
             if board.is_valid_location(col):
                 row = board.get_next_open_row(col)
-                piece = (
-                    Fore.RED + "C" + Style.RESET_ALL
-                    if vs_computer
-                    else Fore.YELLOW + "O" + Style.RESET_ALL
-                )
-                board.add_piece(row, col, piece)
+                board.add_piece(row, col, pieces[1])
                 board.print_board()
-                if board.check_win(piece):
+                if board.check_win_at(row, col):
                     winner = (
                         player_name
                         if turn == 0
@@ -211,18 +652,18 @@ def start_game(player_name, vs_computer=True, player2_name=""):
                 else:
                     turn = 0
 
-        if all(row.count(Fore.GREEN + "P" + Style.RESET_ALL) +
-               row.count(Fore.YELLOW + "O" + Style.RESET_ALL) == 7
-               for row in board.grid):
+        if not game_over and board.is_full():
             print(Fore.YELLOW + "It's a tie!")
             print(Style.RESET_ALL)
             game_over = True
 
         if game_over:
+            record_game(board, players, pieces, started, level)
             if player1 is not None:
                 update_player_record(player1, True if turn == 0 else False)
             if player2 is not None and not vs_computer:
                 update_player_record(player2, True if turn == 1 else False)
+            flush_player_store()
 
             play_again_valid = False
             while not play_again_valid:
@@ -235,14 +676,15 @@ def start_game(player_name, vs_computer=True, player2_name=""):
                         msg_1 = f"New game starts in {countdown}"
                         msg_2 = " seconds..."
                         print(msg_1 + msg_2, end="\r")
-                        time.sleep(1)
+                        pause(1)
                         countdown -= 1
                     print(" " * 40, end="\r")
                     player1, player2 = prepare_game(player_name,
                                                     vs_computer,
                                                     player2_name)
-                    board = Board()
+                    board = Board(BOARD_ROWS, BOARD_COLS, CONNECT)
                     board.print_board()
+                    started = time.time()
                     game_over = False
                     turn = 0
                     play_again_valid = True
@@ -251,7 +693,7 @@ def start_game(player_name, vs_computer=True, player2_name=""):
                     countdown = 2
                     while countdown > 0:
                         print(f"Returning in {countdown} seconds...", end="\r")
-                        time.sleep(1)
+                        pause(1)
                         countdown -= 1
                     print(" " * 40, end="\r")
                     play_again_valid = True
@@ -264,13 +706,20 @@ def start_game(player_name, vs_computer=True, player2_name=""):
 # Run game
 
 
-def run_game():
+def run_game(reload_store=False):
     """
     Executes the main loop of the game.
 
     Continuously displays the main menu and allows user interaction
-    until the game is exited.
+    until the game is exited. The player storage is connected in the
+    background while the menu is shown.
+
+    Args:
+        reload_store (bool): True to download the player records again
+        if they were already loaded, as pooled processes do for each new
+        session.
     """
+    warm_up_player_store(reload_store)
     while is_running:
         main_menu()
 
@@ -336,14 +785,7 @@ def get_valid_player_name(prompt="Enter your name"):
             "and spaces only; at least one letter required): \n"
         ).strip()
 
-        is_length_valid = 3 <= len(player_name) <= 20
-        has_at_least_one_letter = any(char.isalpha() for char in player_name)
-        has_valid_characters = all(
-            char.isalpha() or char.isdigit() or char.isspace()
-            for char in player_name)
-
-        if (is_length_valid and has_at_least_one_letter
-                and has_valid_characters):
+        if is_valid_player_name(player_name):
             return player_name
         else:
             print(
@@ -354,15 +796,66 @@ def get_valid_player_name(prompt="Enter your name"):
                 Style.RESET_ALL)
 
 
+def is_valid_player_name(player_name):
+    """
+    Checks a player name against the rules of 'get_valid_player_name'.
+
+    Args:
+        player_name (str): The name to check.
+
+    Returns:
+        bool: True if the name is valid, False otherwise.
+    """
+    is_length_valid = 3 <= len(player_name) <= 20
+    has_at_least_one_letter = any(char.isalpha() for char in player_name)
+    has_valid_characters = all(
+        char.isalpha() or char.isdigit() or char.isspace()
+        for char in player_name)
+    return (is_length_valid and has_at_least_one_letter
+            and has_valid_characters)
+
+
+# Get difficulty
+
+
+def get_difficulty():
+    """
+    Prompts the user to choose how strong the computer player is.
+
+    Returns:
+        str: The chosen key of 'DIFFICULTY_LEVELS'.
+    """
+    levels = list(DIFFICULTY_LEVELS)
+    while True:
+        print("Choose the computer difficulty:")
+        for number, level in enumerate(levels, start=1):
+            print(f"{number}. {DIFFICULTY_LEVELS[level]['name']}")
+        choice = input(
+            f"Please choose a level (1-{len(levels)}):\n").strip()
+        print()
+
+        if choice.isdigit() and 1 <= int(choice) <= len(levels):
+            return levels[int(choice) - 1]
+        print(
+            Fore.RED +
+            f"Invalid input. Please enter a number between 1 and "
+            f"{len(levels)}.\n" +
+            Style.RESET_ALL)
+
+
 # Find player in HOF sheet
 
 
+@profiled("storage.find_player")
 def find_player(player_name: str):
     """
     Searches for a player by name in the Hall of Fame (HOF) sheet and
     returns their data.
 
-    If the player is found, their data and row index in the HOF sheet
+    The lookup is served by 'get_player_store()' and ignores upper and
+    lower case.
+
+    If the player is found, their data and record key in the HOF sheet
     are returned. If not found, the function attempts to add them as
     a new player, given the name is valid (contains alphabetic
     characters and is longer than 2 characters). In case of invalid
@@ -373,22 +866,25 @@ def find_player(player_name: str):
 
     Returns:
         tuple: A tuple containing the player's data as a dictionary
-               and their row index in the HOF sheet, or None and the
-               new player's index if a new player is added.
+               and their record key in the HOF sheet, or None and the
+               new player's key if a new player is added.
 
     Raises:
         ValueError: If the player is not found in the HOF sheet.
         gspread.exceptions.GSpreadException: For issues related to
         accessing the HOF sheet.
     """
+    store = open_player_store()
+    if store is None:
+        return None
     try:
-        cell = HOF_SHEET.find(player_name)
-        if cell:
-            player_data = HOF_SHEET.row_values(cell.row)
+        record = store.find(player_name)
+        if record:
+            row, player_data = record
             player = Player(player_name)
             player.games_won = int(player_data[1])
             player.games_lost = int(player_data[2])
-            player.index = cell.row
+            player.index = row
             return player
 
         else:
@@ -399,7 +895,7 @@ def find_player(player_name: str):
                 player.index = new_index
                 return player
 
-    except (WorksheetNotFound, SpreadsheetNotFound, APIError, Exception) as e:
+    except Exception as e:
         print(Fore.RED + f"An error occurred: {e}" + Style.RESET_ALL)
         return None
 
@@ -407,34 +903,35 @@ def find_player(player_name: str):
 # Add player if not found in sheet
 
 
+@profiled("storage.add_new_player")
 def add_new_player(player_name):
     """
     Adds a new player to the Hall of Fame spreadsheet.
 
+    The player is saved through 'get_player_store()'.
+
     Args:
         player_name (str): The name of the new player to add.
 
     Returns:
-        int: The row index of the newly added player in the HOF sheet.
+        The record key of the newly added player in the HOF sheet.
     """
-    new_player_data = [player_name, 0, 0]
-    HOF_SHEET.append_row(new_player_data)
+    new_index = get_player_store().add(player_name)
     print(Fore.GREEN + f"New Player {player_name} added...\n")
     print(Style.RESET_ALL)
-
-    player_data = HOF_SHEET.get_all_records()
-    new_index = len(player_data) + 1
     return new_index
 
 
 # Update player record in HOF sheet
 
 
+@profiled("storage.update_player_record")
 def update_player_record(player, won):
     """
     Updates the player's win-loss record in the Hall of Fame spreadsheet.
 
     Increments the win count if the player won, or the loss count if they lost.
+    The count is incremented through 'get_player_store()'.
 
     Args:
         player (Player): The player object whose record needs updating.
@@ -445,8 +942,7 @@ def update_player_record(player, won):
     else:
         player.record_loss()
 
-    HOF_SHEET.update_cell(player.index, 2, player.games_won)
-    HOF_SHEET.update_cell(player.index, 3, player.games_lost)
+    get_player_store().increment(player.index, won)
 
     return (f"Updated record for {player.name}: "
             f"Wins - {player.games_won}, Losses - {player.games_lost}")
@@ -469,7 +965,8 @@ def get_player_move(player_name, board):
     """
     while True:
         col_input = input(
-            f"\n{player_name}, choose a column to place your piece (1-7), "
+            f"\n{player_name}, choose a column to place your piece "
+            f"(1-{board.cols}), "
             f"or press 'Q' to quit: \n"
         )
 
@@ -481,7 +978,7 @@ def get_player_move(player_name, board):
                 countdown = 2
                 while countdown > 0:
                     print(f"Returning in {countdown} seconds...", end="\r")
-                    time.sleep(1)
+                    pause(1)
                     countdown -= 1
                 print(" " * 40, end="\r")
                 return None
@@ -495,7 +992,7 @@ def get_player_move(player_name, board):
                 )
         elif col_input.isdigit():
             col = int(col_input) - 1
-            if 0 <= col < 7:
+            if 0 <= col < board.cols:
                 if board.is_valid_location(col):
                     return col
                 else:
@@ -508,13 +1005,13 @@ def get_player_move(player_name, board):
                 print(
                     Fore.RED +
                     "Column number out of range. Please "
-                    "choose a number between 1 and 7.\n" +
+                    f"choose a number between 1 and {board.cols}.\n" +
                     Style.RESET_ALL)
         else:
             print(
                 Fore.RED +
                 "Invalid input. Please enter a valid number "
-                "between 1 and 7 or 'Q' to quit.\n" +
+                f"between 1 and {board.cols} or 'Q' to quit.\n" +
                 Style.RESET_ALL)
 
 
@@ -525,343 +1022,4165 @@ def check_for_blocking_move(board, player_piece):
     """
     Identifies a column where a blocking move can be made against the opponent.
 
+    Only the next playable cell of each column is considered, looked up
+    in the board's 'ThreatMap'.
+
     Args:
         board (Board): The current game board.
-        player_piece (str): The piece representation of the current player.
+        player_piece (int): The piece code of the current player.
 
     Returns:
         int or None: The column index for a blocking move, or None if no
         such move is found.
     """
     opponent_piece = (
-        Fore.GREEN + "P" + Style.RESET_ALL
-        if player_piece == Fore.RED + "C" + Style.RESET_ALL
-        else Fore.RED + "C" + Style.RESET_ALL
+        PLAYER_PIECE if player_piece == COMPUTER_PIECE else COMPUTER_PIECE
     )
 
-    for c in range(7):
-        for r in range(6):
-            if board.grid[r][c] == " " and board.is_valid_location(c):
-                # Temporarily simulate an opponent's move
-                board.grid[r][c] = opponent_piece
-                if board.check_win(opponent_piece):
-                    board.grid[r][c] = " "  # Undo the move
-                    return c  # Return the blocking column
-                # Undo the move if it does not result in a win
-                board.grid[r][c] = " "
-
-    return None
+    # The threat map knows which playable cells would win for the opponent
+    blocking_columns = board.winning_columns(opponent_piece)
+    return blocking_columns[0] if blocking_columns else None
 
 
 # Computer move
 
 
-def get_computer_move(board, player_piece):
+@profiled("ai.get_computer_move")
+def get_computer_move(board, player_piece, difficulty="easy"):
     """
     Determines the computer's move based on the current state of the board.
 
+    On the easiest level the computer only blocks an immediate win of
+    the opponent and otherwise plays a random column. The negamax levels
+    play from the opening book while the position is in it, and
+    otherwise run a 'NegamaxSearch' with the depth and time budget
+    configured in 'DIFFICULTY_LEVELS'. The Monte Carlo level runs a
+    'MonteCarloSearch' with its playout budget.
+
     Args:
         board (Board): The current game board.
-        player_piece (str): The piece representation of the player.
+        player_piece (int): The piece code of the player.
+        difficulty (str): Key into 'DIFFICULTY_LEVELS'.
 
     Returns:
         int: The chosen column index for the computer's move.
     """
+    level = DIFFICULTY_LEVELS[difficulty]
+    if level["engine"] == "mcts":
+        search = MonteCarloSearch(level["playouts"], level["time_limit"],
+                                  level["processes"])
+        return search.best_move(board.bitboard,
+                                board.player_index(player_piece))
+
+    if level["engine"] == "negamax":
+        book = get_opening_book()
+        if book is not None:
+            book_move = book.lookup(board.bitboard)
+            if book_move is not None:
+                return book_move
+        search = NegamaxSearch(level["depth"], level["time_limit"],
+                               TRANSPOSITION_TABLE)
+        move = search.best_move(board.bitboard,
+                                board.player_index(player_piece))
+        if PROFILER.enabled:
+            PROFILER.set("tt.size", TRANSPOSITION_TABLE.size)
+            PROFILER.set("tt.probes", TRANSPOSITION_TABLE.probes)
+            PROFILER.set("tt.hits", TRANSPOSITION_TABLE.hits)
+            PROFILER.set("tt.hit_rate", TRANSPOSITION_TABLE.hit_rate())
+        return move
+
     blocking_move = check_for_blocking_move(board, player_piece)
     if blocking_move is not None:
         return blocking_move
 
     valid_locations = [col for col in range(
-        7) if is_valid_location(board, col)]
+        board.cols) if is_valid_location(board, col)]
     return random.choice(valid_locations)
 
 
-# Create board
+# Computer search
 
 
-def create_board():
+class SearchTimeout(Exception):
     """
-    Creates a new game board for Connect Four.
-
-    Initializes a 6x7 grid with each cell set to empty space.
-
-    Returns:
-        list: A 2D list representing the game board.
+    Raised inside a search when its time budget has run out.
     """
-    return [[" " for _ in range(7)] for _ in range(6)]
 
 
-# Validation check
+class TranspositionTable:
+    """
+    Remembers search results for positions by their Zobrist hash.
 
+    The table is a fixed number of slots stored in parallel lists, so
+    its memory never grows. A new result replaces the one in its slot
+    when the slot is empty, holds the same position, was written by an
+    older search or was searched less deeply.
 
-def is_valid_location(board, col):
+    Attributes:
+        size (int): Number of slots, a power of two.
+        generation (int): Counter of searches, used to age out entries.
+        probes (int): Number of lookups.
+        hits (int): Number of lookups that found their position.
+        stores (int): Number of results written.
     """
-    Checks if a move can be made in the specified column.
 
-    Args:
-        board (Board): The current game board.
-        col (int): The column index to check.
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
 
-    Returns:
-        bool: True if the top cell of the column is empty, False otherwise.
-    """
-    if 0 <= col < 7:
-        return board.grid[0][col] == " "
-    else:
-        return False
+    def __init__(self, size=TRANSPOSITION_TABLE_SIZE):
+        """
+        Initializes an empty table.
 
+        Args:
+            size (int): Number of slots, rounded up to a power of two.
+        """
+        self.size = 1 << max(size - 1, 1).bit_length()
+        self.keys = [None] * self.size
+        self.depths = [0] * self.size
+        self.flags = [0] * self.size
+        self.scores = [0] * self.size
+        self.moves = [None] * self.size
+        self.ages = [0] * self.size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        """
+        Marks the start of a new search so older entries can be replaced.
+        """
+        self.generation += 1
 
-# Find next open row
+    def probe(self, key):
+        """
+        Looks up a position.
 
+        Args:
+            key (int): The Zobrist hash of the position.
 
-def get_next_open_row(board, col):
-    """
-    Finds the next open row in a specified column on the board.
+        Returns:
+            tuple: The stored (depth, flag, score, move), or None if the
+            position is not in the table.
+        """
+        self.probes += 1
+        slot = key & (self.size - 1)
+        if self.keys[slot] != key:
+            return None
+        self.hits += 1
+        return (self.depths[slot], self.flags[slot], self.scores[slot],
+                self.moves[slot])
+
+    def store(self, key, depth, flag, score, move):
+        """
+        Saves a search result, subject to the replacement policy.
 
-    Args:
-        board (Board): The current game board.
-        col (int): The column index to check.
+        Args:
+            key (int): The Zobrist hash of the position.
+            depth (int): How many plies deep the position was searched.
+            flag (int): 'EXACT', 'LOWER' or 'UPPER' bound of the score.
+            score (int): The score of the position.
+            move (int): The best column found, or None.
+        """
+        slot = key & (self.size - 1)
+        if (self.keys[slot] is not None and self.keys[slot] != key
+                and self.ages[slot] == self.generation
+                and self.depths[slot] > depth):
+            return
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.flags[slot] = flag
+        self.scores[slot] = score
+        self.moves[slot] = move
+        self.ages[slot] = self.generation
+        self.stores += 1
+
+    def hit_rate(self):
+        """
+        Returns the share of lookups that found their position.
 
-    Returns:
-        int: The row index of the next open cell, or -1 if the column is full.
-    """
-    for row in range(5, -1, -1):
-        if board.grid[row][col] == " ":
-            return row
-    return -1
+        Returns:
+            float: A value between 0 and 1.
+        """
+        return self.hits / self.probes if self.probes else 0.0
 
+    def clear(self):
+        """
+        Empties the table and resets its counters.
+        """
+        self.__init__(self.size)
 
-# Place piece
 
+TRANSPOSITION_TABLE = TranspositionTable()
 
-def place_piece(board, row, col, piece):
-    """
-    Places a piece on the board at the specified row and column.
 
-    Args:
-        board (Board): The game board.
-        row (int): The row index to place the piece.
-        col (int): The column index to place the piece.
-        piece (str): The piece to place on the board.
+def popcount(value):
     """
-    board.grid[row][col] = piece
+    Counts the set bits of a non-negative integer.
 
+    'int.bit_count' would be faster but needs Python 3.10, and the
+    deployment image runs Python 3.8.
 
-# Classes
-
+    Args:
+        value (int): The integer.
 
-# Class board
+    Returns:
+        int: The number of bits that are 1.
+    """
+    return bin(value).count("1")
 
 
-class Board:
+class NegamaxSearch:
     """
-    Represents the game board for Connect Four.
+    Finds the computer's move with a negamax alpha-beta search.
+
+    Columns are tried from the center outwards, which is where the best
+    moves usually are and makes the alpha-beta cut-offs happen early.
+    The search deepens one ply at a time and, when the time budget is
+    spent, returns the best move of the deepest finished iteration.
+
+    Results are kept in a 'TranspositionTable' so positions reached
+    through different move orders are only searched once.
 
     Attributes:
-        rows (int): Number of rows in the game board.
-        cols (int): Number of columns in the game board.
-        grid (list of lists): A 2D list representing the game board,
-        where each cell can be empty or contain a player's piece.
+        max_depth (int): The deepest iteration to search.
+        time_limit (float): Seconds allowed per move, 0 for no limit.
+        table (TranspositionTable): Cache of earlier search results.
+        nodes (int): Number of positions visited by the last search.
+        depth_reached (int): Deepest fully searched iteration.
     """
 
-    def __init__(self, rows=6, cols=7):
+    WIN_SCORE = 1000000
+
+    def __init__(self, max_depth=42, time_limit=0, table=None):
         """
-        Initializes a new game board with the specified number of rows
-        and columns.
+        Initializes the search settings.
 
         Args:
-            rows (int): Number of rows in the game board, defaults to 6.
-            cols (int): Number of columns in the game board, defaults to 7.
+            max_depth (int): The deepest iteration to search.
+            time_limit (float): Seconds allowed per move, 0 for no limit.
+            table (TranspositionTable): Table to share between searches,
+            a new one is created if omitted.
         """
-        self.rows = rows
-        self.cols = cols
-        self.grid = [[" " for _ in range(cols)] for _ in range(rows)]
-
-    def add_piece(self, row, col, piece):
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.table = table if table is not None else TranspositionTable()
+        self.deadline = None
+        self.nodes = 0
+        self.depth_reached = 0
+        self.windows = []
+        self.weights = []
+        self.order = []
+
+    def best_move(self, bitboard, player):
         """
-        Adds a piece to the specified location on the board.
+        Searches the position and returns the best column for 'player'.
 
         Args:
-            row (int): The row index to place the piece.
-            col (int): The column index to place the piece.
-            piece (str): The symbol representing the player's piece.
-        """
-        self.grid[row][col] = piece
+            bitboard (BitBoard): The position to search. It is restored
+            to its original state before this method returns.
+            player (int): The player index of the side to move.
 
-    def is_valid_location(self, col):
+        Returns:
+            int: The chosen column index.
         """
-        Checks if a column can accept a new piece.
+        self.deadline = (time.perf_counter() + self.time_limit
+                         if self.time_limit else None)
+        self.nodes = 0
+        self.depth_reached = 0
+        self.table.new_search()
+        self.windows = get_winning_lines(bitboard.rows, bitboard.cols,
+                                         bitboard.connect).masks
+        self.weights = self.window_weights(bitboard.connect)
+        center = bitboard.cols // 2
+        self.order = sorted(range(bitboard.cols),
+                            key=lambda col: abs(col - center))
+
+        moves = [col for col in self.order if bitboard.can_play(col)]
+        best = moves[0]
+        depth_limit = min(self.max_depth,
+                          bitboard.rows * bitboard.cols - len(bitboard.moves))
+        for depth in range(1, depth_limit + 1):
+            try:
+                score, move = self.search_root(bitboard, player, depth,
+                                               best)
+            except SearchTimeout:
+                break
+            best = move
+            self.depth_reached = depth
+            if abs(score) >= self.WIN_SCORE - bitboard.rows * bitboard.cols:
+                break
+        return best
+
+    def search_root(self, bitboard, player, depth, first):
+        """
+        Runs one iteration of the search at the root position.
 
         Args:
-            col (int): The column index to check.
+            bitboard (BitBoard): The position to search.
+            player (int): The player index of the side to move.
+            depth (int): Number of plies to look ahead.
+            first (int): Column to try first, usually the best move of
+            the previous iteration.
 
         Returns:
-            bool: True if the top cell of the column is empty, False otherwise.
+            tuple: The best score and the column that achieves it.
+        """
+        alpha, beta = -self.WIN_SCORE - 1, self.WIN_SCORE + 1
+        best_move = first
+        for col in [first] + [c for c in self.order if c != first]:
+            if not bitboard.can_play(col):
+                continue
+            row = bitboard.play(col, player)
+            try:
+                if bitboard.is_win_at(row, col):
+                    score = self.WIN_SCORE - 1
+                else:
+                    score = -self.negamax(bitboard, 1 - player, depth - 1,
+                                          -beta, -alpha, 2)
+            finally:
+                bitboard.undo()
+            if score > alpha:
+                alpha, best_move = score, col
+        return alpha, best_move
+
+    def negamax(self, bitboard, player, depth, alpha, beta, ply):
         """
-        return self.grid[0][col] == " "
+        Scores a position from the point of view of the side to move.
 
-    def get_next_open_row(self, col):
+        Args:
+            bitboard (BitBoard): The position to search.
+            player (int): The player index of the side to move.
+            depth (int): Remaining plies to look ahead.
+            alpha (int): Lower bound of the search window.
+            beta (int): Upper bound of the search window.
+            ply (int): Distance from the root, used to prefer quick wins.
+
+        Returns:
+            int: The score of the position.
+
+        Raises:
+            SearchTimeout: If the time budget runs out.
         """
-        Finds the next open row in the given column.
+        self.nodes += 1
+        if (self.deadline and not self.nodes & 1023
+                and time.perf_counter() > self.deadline):
+            raise SearchTimeout()
+
+        moves = [col for col in self.order if bitboard.can_play(col)]
+        if not moves:
+            return 0
+        for col in moves:
+            row = bitboard.play(col, player)
+            won = bitboard.is_win_at(row, col)
+            bitboard.undo()
+            if won:
+                return self.WIN_SCORE - ply
+        if depth == 0:
+            return self.evaluate(bitboard, player)
+
+        alpha_start = alpha
+        entry = self.table.probe(bitboard.hash)
+        if entry is not None:
+            entry_depth, flag, score, move = entry
+            if move is not None and bitboard.can_play(move):
+                moves.remove(move)
+                moves.insert(0, move)
+            if entry_depth >= depth:
+                score = self.score_from_table(score, ply)
+                if flag == TranspositionTable.EXACT:
+                    return score
+                if flag == TranspositionTable.LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        best_score, best_move = -self.WIN_SCORE - 1, None
+        for col in moves:
+            bitboard.play(col, player)
+            try:
+                score = -self.negamax(bitboard, 1 - player, depth - 1,
+                                      -beta, -alpha, ply + 1)
+            finally:
+                bitboard.undo()
+            if score > best_score:
+                best_score, best_move = score, col
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best_score <= alpha_start:
+            flag = TranspositionTable.UPPER
+        elif best_score >= beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        self.table.store(bitboard.hash, depth, flag,
+                         self.score_to_table(best_score, ply), best_move)
+        return best_score
+
+    @staticmethod
+    def window_weights(connect):
+        """
+        Returns how much a window counts by the number of discs in it.
+
+        Each extra disc makes a window four times as valuable, and a
+        window one disc short of a line counts double on top of that.
+        For Connect Four this gives 1, 4 and 32 for one to three discs.
 
         Args:
-            col (int): The column index to check.
+            connect (int): Number of discs in a row needed to win.
 
         Returns:
-            int: The row index of the next open cell in the specified column,
-            or None if the column is full.
+            list: The weight for 0 to 'connect' discs.
+        """
+        return ([0] + [4 ** (count - 1) for count in range(1, connect - 1)]
+                + [2 * 4 ** (connect - 2), 0])
+
+    def score_to_table(self, score, ply):
+        """
+        Makes a win or loss score relative to the stored position.
+
+        Win scores count plies from the root, so they are shifted to
+        count from the position itself before being stored.
+
+        Args:
+            score (int): The score as returned by 'negamax'.
+            ply (int): Distance of the position from the root.
+
+        Returns:
+            int: The score to store in the table.
+        """
+        if score > self.WIN_SCORE // 2:
+            return score + ply
+        if score < -self.WIN_SCORE // 2:
+            return score - ply
+        return score
+
+    def score_from_table(self, score, ply):
+        """
+        Turns a stored score back into one relative to the root.
+
+        Args:
+            score (int): The score read from the table.
+            ply (int): Distance of the position from the root.
+
+        Returns:
+            int: The score as 'negamax' would return it.
+        """
+        if score > self.WIN_SCORE // 2:
+            return score - ply
+        if score < -self.WIN_SCORE // 2:
+            return score + ply
+        return score
+
+    def evaluate(self, bitboard, player):
+        """
+        Estimates a position that is not searched any deeper.
+
+        Every window of 'connect' cells that holds discs of only one player
+        counts for that player, more so the fuller it is.
+
+        Args:
+            bitboard (BitBoard): The position to score.
+            player (int): The player index of the side to move.
+
+        Returns:
+            int: Positive if the position favours 'player'.
+        """
+        own, other = bitboard.masks[player], bitboard.masks[1 - player]
+        weights = self.weights
+        score = 0
+        for window in self.windows:
+            if not window & other:
+                score += weights[popcount(window & own)]
+            elif not window & own:
+                score -= weights[popcount(window & other)]
+        return score
+
+
+# Monte Carlo search
+
+
+class MonteCarloNode:
+    """
+    A position in the Monte Carlo search tree.
+
+    Attributes:
+        move (int): The column played to reach this position.
+        parent (MonteCarloNode): The position before that move.
+        player (int): The player index who played 'move'.
+        children (list): Expanded child positions.
+        untried (list): Columns that have no child position yet.
+        wins (float): Playout results for 'player', a draw counting half.
+        visits (int): Number of playouts through this position.
+        terminal (bool): True if the game is over in this position.
+        winner (int): The winning player index of a terminal position,
+        or None for a draw.
+    """
+
+    __slots__ = ("move", "parent", "player", "children", "untried", "wins",
+                 "visits", "terminal", "winner")
+
+    def __init__(self, move, parent, player, untried):
+        """
+        Initializes a position that has not been visited yet.
+
+        Args:
+            move (int): The column played to reach this position.
+            parent (MonteCarloNode): The position before that move.
+            player (int): The player index who played 'move'.
+            untried (list): The columns playable in this position.
+        """
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.children = []
+        self.untried = untried
+        self.wins = 0.0
+        self.visits = 0
+        self.terminal = False
+        self.winner = None
+
+    def select_child(self, exploration):
+        """
+        Picks the child with the highest UCT value.
+
+        Args:
+            exploration (float): Weight of the exploration term.
+
+        Returns:
+            MonteCarloNode: The selected child.
+        """
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: (
+            child.wins / child.visits
+            + exploration * math.sqrt(log_visits / child.visits)))
+
+
+def run_playouts(bitboard, player, playouts, deadline=None, seed=None,
+                 exploration=1.41):
+    """
+    Grows a UCT search tree from a position.
+
+    Each playout walks down the tree by UCT value, adds one new position
+    and finishes the game with random moves. The result is counted in
+    every position on the way back up.
+
+    Args:
+        bitboard (BitBoard): The position to search. It is restored to
+        its original state before this function returns.
+        player (int): The player index of the side to move.
+        playouts (int): Number of playouts to run.
+        deadline (float): 'time.perf_counter' value at which to stop
+        early, or None for no time limit.
+        seed (int): Seed for the random moves.
+        exploration (float): Weight of the UCT exploration term.
+
+    Returns:
+        tuple: A dictionary of visits per root column and the number of
+        playouts that were run.
+    """
+    rng = random.Random(seed)
+    root = MonteCarloNode(None, None, 1 - player,
+                          [col for col in range(bitboard.cols)
+                           if bitboard.can_play(col)])
+    done = 0
+    while done < playouts:
+        if (deadline is not None and not done & 63
+                and time.perf_counter() > deadline):
+            break
+        node = root
+        played = 0
+        while not node.untried and node.children:
+            node = node.select_child(exploration)
+            bitboard.play(node.move, node.player)
+            played += 1
+
+        if node.untried and not node.terminal:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            mover = 1 - node.player
+            row = bitboard.play(move, mover)
+            played += 1
+            child = MonteCarloNode(move, node, mover, [])
+            if bitboard.is_win_at(row, move):
+                child.terminal, child.winner = True, mover
+            elif bitboard.is_full():
+                child.terminal = True
+            else:
+                child.untried = [col for col in range(bitboard.cols)
+                                 if bitboard.can_play(col)]
+            node.children.append(child)
+            node = child
+
+        if node.terminal:
+            winner = node.winner
+        else:
+            winner = random_playout(bitboard, 1 - node.player, rng)
+
+        while node is not None:
+            node.visits += 1
+            if winner == node.player:
+                node.wins += 1
+            elif winner is None:
+                node.wins += 0.5
+            node = node.parent
+        for _ in range(played):
+            bitboard.undo()
+        done += 1
+
+    return {child.move: child.visits for child in root.children}, done
+
+
+def random_playout(bitboard, player, rng):
+    """
+    Finishes a game with random moves and takes them back again.
+
+    Args:
+        bitboard (BitBoard): The position to play out.
+        player (int): The player index of the side to move.
+        rng (random.Random): The random number generator.
+
+    Returns:
+        int: The winning player index, or None for a draw.
+    """
+    played = 0
+    winner = None
+    while not bitboard.is_full():
+        col = rng.choice([col for col in range(bitboard.cols)
+                          if bitboard.can_play(col)])
+        row = bitboard.play(col, player)
+        played += 1
+        if bitboard.is_win_at(row, col):
+            winner = player
+            break
+        player = 1 - player
+    for _ in range(played):
+        bitboard.undo()
+    return winner
+
+
+def _monte_carlo_worker(task):
+    """
+    Runs 'run_playouts' inside a worker process.
+
+    Args:
+        task (tuple): The arguments for 'run_playouts'.
+
+    Returns:
+        tuple: The result of 'run_playouts'.
+    """
+    return run_playouts(*task)
+
+
+_monte_carlo_pool = None
+_monte_carlo_pool_size = 0
+
+
+def get_monte_carlo_pool(processes):
+    """
+    Returns the worker pool for parallel playouts, starting it on first
+    use so later moves do not pay for starting processes.
+
+    Args:
+        processes (int): Number of worker processes.
+
+    Returns:
+        multiprocessing.pool.Pool: The worker pool.
+    """
+    global _monte_carlo_pool, _monte_carlo_pool_size
+    if _monte_carlo_pool_size != processes:
+        if _monte_carlo_pool is None:
+            atexit.register(close_monte_carlo_pool)
+        else:
+            _monte_carlo_pool.terminate()
+        _monte_carlo_pool = multiprocessing.Pool(processes)
+        _monte_carlo_pool_size = processes
+    return _monte_carlo_pool
+
+
+def close_monte_carlo_pool():
+    """
+    Stops the worker pool for parallel playouts, if it was started.
+    """
+    if _monte_carlo_pool is not None:
+        _monte_carlo_pool.terminate()
+
+
+class MonteCarloSearch:
+    """
+    Finds the computer's move with Monte Carlo Tree Search (UCT).
+
+    With more than one process the search uses root parallelization:
+    every worker grows its own tree from the current position with a
+    share of the playouts, and the visit counts of the root moves are
+    added up. The most visited column is played.
+
+    Attributes:
+        playouts (int): Number of playouts per move.
+        time_limit (float): Seconds allowed per move, 0 for no limit.
+        processes (int): Number of worker processes.
+        done (int): Playouts run by the last search.
+        elapsed (float): Seconds taken by the last search, not counting
+        starting the worker pool.
+    """
+
+    def __init__(self, playouts=4000, time_limit=0, processes=None):
+        """
+        Initializes the search settings.
+
+        Args:
+            playouts (int): Number of playouts per move.
+            time_limit (float): Seconds allowed per move, 0 for no limit.
+            processes (int): Number of worker processes, defaults to the
+            number of CPUs. Inside a worker process, such as a self-play
+            game, the search always runs in that process.
+        """
+        self.playouts = playouts
+        self.time_limit = time_limit
+        if multiprocessing.current_process().daemon:
+            processes = 1
+        self.processes = processes or os.cpu_count() or 1
+        self.done = 0
+        self.elapsed = 0.0
+
+    def best_move(self, bitboard, player):
+        """
+        Searches the position and returns the best column for 'player'.
+
+        A move that wins at once is played without searching. The
+        worker pool is started before the clock starts, so neither the
+        time limit nor the playout rate includes starting processes.
+        While profiling, the rate is reported as the metric
+        "mcts.playouts_per_s".
+
+        Args:
+            bitboard (BitBoard): The position to search.
+            player (int): The player index of the side to move.
+
+        Returns:
+            int: The chosen column index.
+        """
+        moves = [col for col in range(bitboard.cols)
+                 if bitboard.can_play(col)]
+        for col in moves:
+            row = bitboard.play(col, player)
+            won = bitboard.is_win_at(row, col)
+            bitboard.undo()
+            if won:
+                return col
+
+        pool = (get_monte_carlo_pool(self.processes)
+                if self.processes > 1 else None)
+        start = time.perf_counter()
+        deadline = start + self.time_limit if self.time_limit else None
+        seed = random.getrandbits(32)
+        if pool is not None:
+            share = -(-self.playouts // self.processes)
+            tasks = [(bitboard, player, share, deadline, seed + number)
+                     for number in range(self.processes)]
+            results = pool.map(_monte_carlo_worker, tasks)
+        else:
+            results = [run_playouts(bitboard, player, self.playouts,
+                                    deadline, seed)]
+
+        visits = dict.fromkeys(moves, 0)
+        self.done = 0
+        for counts, done in results:
+            self.done += done
+            for col, count in counts.items():
+                visits[col] += count
+        self.elapsed = time.perf_counter() - start
+        if PROFILER.enabled:
+            PROFILER.count("mcts.playouts", self.done)
+            PROFILER.set("mcts.playouts_per_s", self.playouts_per_second())
+        return max(moves, key=visits.get)
+
+    def playouts_per_second(self):
+        """
+        Returns the playout rate of the last search.
+
+        Returns:
+            float: Playouts per second.
+        """
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+
+# Opening book
+
+
+class OpeningBook:
+    """
+    Looks up precomputed opening moves in a memory-mapped book file.
+
+    The file starts with a header ('MAGIC', board rows and columns, the
+    number of discs in a row needed to win and the number of records)
+    followed by records of a 64-bit position key and a column, sorted
+    by key. Records are found by binary search directly in the mapped
+    file, so opening a book costs no time and no memory however large
+    it is.
+
+    Attributes:
+        rows (int): Number of rows of the board the book was built for.
+        cols (int): Number of columns of that board.
+        connect (int): Number of discs in a row needed to win.
+        count (int): Number of positions in the book.
+    """
+
+    MAGIC = b"C4OB"
+    HEADER = struct.Struct("<4sBBBI")
+    RECORD = struct.Struct("<QB")
+
+    def __init__(self, path):
         """
-        for r in range(self.rows - 1, -1, -1):
-            if self.grid[r][col] == " ":
-                return r
+        Opens and maps a book file.
+
+        Args:
+            path (str): Path of the book file.
+
+        Raises:
+            ValueError: If the file is not an opening book.
+        """
+        with open(path, "rb") as book_file:
+            self.data = mmap.mmap(book_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        magic, self.rows, self.cols, self.connect, self.count = \
+            self.HEADER.unpack_from(self.data, 0)
+        if magic != self.MAGIC:
+            self.data.close()
+            raise ValueError(f"{path} is not an opening book")
+
+    def lookup(self, bitboard):
+        """
+        Finds the book move for a position.
+
+        Args:
+            bitboard (BitBoard): The position to look up.
+
+        Returns:
+            int: The column to play, or None if the position is not in
+            the book.
+        """
+        if ((bitboard.rows, bitboard.cols, bitboard.connect)
+                != (self.rows, self.cols, self.connect)):
+            return None
+        key = bitboard.key()
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = self.HEADER.size + middle * self.RECORD.size
+            record_key, move = self.RECORD.unpack_from(self.data, offset)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                return move if bitboard.can_play(move) else None
         return None
 
-    def print_board(self):
-        """
-        Displays the game board in a readable format.
+    def close(self):
+        """
+        Unmaps the book file.
+        """
+        self.data.close()
+
+    @classmethod
+    def write(cls, path, rows, cols, connect, entries):
+        """
+        Writes a book file.
+
+        Args:
+            path (str): Path of the book file.
+            rows (int): Number of rows of the board.
+            cols (int): Number of columns of the board.
+            connect (int): Number of discs in a row needed to win.
+            entries (dict): Maps position keys to columns.
+        """
+        with open(path, "wb") as book_file:
+            book_file.write(cls.HEADER.pack(cls.MAGIC, rows, cols, connect,
+                                            len(entries)))
+            for key in sorted(entries):
+                book_file.write(cls.RECORD.pack(key, entries[key]))
+
+
+_opening_book = None
+_opening_book_checked = False
+
+
+def get_opening_book():
+    """
+    Returns the opening book, opening it on first use.
+
+    Returns:
+        OpeningBook: The book, or None if 'OPENING_BOOK_FILE' does not
+        exist or cannot be read.
+    """
+    global _opening_book, _opening_book_checked
+    if not _opening_book_checked:
+        _opening_book_checked = True
+        try:
+            _opening_book = OpeningBook(OPENING_BOOK_FILE)
+        except (OSError, ValueError, struct.error):
+            _opening_book = None
+    return _opening_book
+
+
+def build_opening_book(path=OPENING_BOOK_FILE, plies=8, depth=10,
+                       time_limit=0, rows=6, cols=7, connect=4, player=1):
+    """
+    Searches the opening positions and writes the results to a book file.
+
+    Every position within 'plies' moves of the start is visited. Where
+    'player' is to move only the best move found is followed, and where
+    the opponent is to move every reply is, so the book covers all the
+    ways an opponent can open against the computer.
+
+    Args:
+        path (str): Path of the book file to write.
+        plies (int): How many moves from the start the book covers.
+        depth (int): Search depth per position.
+        time_limit (float): Seconds allowed per position, 0 for no limit.
+        rows (int): Number of rows of the board.
+        cols (int): Number of columns of the board.
+        connect (int): Number of discs in a row needed to win.
+        player (int): The player index the book plays for; 1 is the
+        computer, which moves second.
+
+    Returns:
+        int: Number of positions written to the book.
+
+    Raises:
+        ValueError: If the position keys of the board do not fit in
+        64 bits.
+    """
+    if cols * (rows + 1) > 64:
+        raise ValueError("Opening books need boards with at most 64 "
+                         "cells including one spare row")
+    bitboard = BitBoard(rows, cols, connect)
+    search = NegamaxSearch(depth, time_limit)
+    entries = {}
+
+    def visit(side):
+        if len(bitboard.moves) >= plies:
+            return
+        if side == player:
+            key = bitboard.key()
+            if key in entries:
+                return
+            move = search.best_move(bitboard, side)
+            entries[key] = move
+            moves = [move]
+        else:
+            moves = [col for col in range(cols) if bitboard.can_play(col)]
+        for col in moves:
+            row = bitboard.play(col, side)
+            if not bitboard.is_win_at(row, col):
+                visit(1 - side)
+            bitboard.undo()
+
+    visit(0)
+    OpeningBook.write(path, rows, cols, connect, entries)
+    return len(entries)
+
+
+# Self-play
+
+
+def random_move(board, player_piece):
+    """
+    Move provider that plays a random valid column.
+
+    Args:
+        board (Board): The current game board.
+        player_piece (int): The piece code of the player.
+
+    Returns:
+        int: The chosen column index.
+    """
+    return random.choice([col for col in range(board.cols)
+                          if board.is_valid_location(col)])
+
+
+def get_move_provider(name):
+    """
+    Returns the move provider for a name given on the command line.
+
+    Args:
+        name (str): 'random' or a key of 'DIFFICULTY_LEVELS'.
+
+    Returns:
+        callable: A function taking a board and a piece and returning a
+        column, which can be sent to other processes.
+
+    Raises:
+        ValueError: If the name is unknown.
+    """
+    if name == "random":
+        return random_move
+    if name in DIFFICULTY_LEVELS:
+        return functools.partial(get_computer_move, difficulty=name)
+    raise ValueError(f"Unknown player '{name}'")
+
+
+def play_headless_game(first, second, rows=6, cols=7, connect=4):
+    """
+    Plays one game between two move providers without any screen output.
+
+    Args:
+        first (callable): Move provider of the player who starts.
+        second (callable): Move provider of the other player.
+        rows (int): Number of rows of the board.
+        cols (int): Number of columns of the board.
+        connect (int): Number of discs in a row needed to win.
+
+    Returns:
+        dict: The 'winner' (0 for 'first', 1 for 'second' or None for a
+        tie), the list of 'moves' and the 'latencies' in seconds of
+        each player's moves.
+    """
+    board = Board(rows, cols, connect)
+    providers = (first, second)
+    pieces = (PLAYER_PIECE, COMPUTER_PIECE)
+    moves = []
+    latencies = ([], [])
+    turn = 0
+    while not board.is_full():
+        start = time.perf_counter()
+        col = providers[turn](board, pieces[turn])
+        latencies[turn].append(time.perf_counter() - start)
+        row = board.get_next_open_row(col)
+        board.add_piece(row, col, pieces[turn])
+        moves.append(col)
+        if board.check_win_at(row, col):
+            return {"winner": turn, "moves": moves, "latencies": latencies}
+        turn = 1 - turn
+    return {"winner": None, "moves": moves, "latencies": latencies}
+
+
+def _self_play_game(task):
+    """
+    Plays one game of a self-play run inside a worker process.
+
+    Args:
+        task (tuple): The two move providers, the game number, the base
+        seed, whether to swap who starts, and the board size.
+
+    Returns:
+        dict: The result of 'play_headless_game' with 'winner' and
+        'latencies' given in the order of the providers passed in.
+    """
+    first, second, number, seed, swap, rows, cols, connect = task
+    random.seed(seed + number)
+    swapped = swap and number % 2 == 1
+    if swapped:
+        first, second = second, first
+    result = play_headless_game(first, second, rows, cols, connect)
+    if swapped:
+        if result["winner"] is not None:
+            result["winner"] = 1 - result["winner"]
+        result["latencies"] = result["latencies"][::-1]
+    return result
+
+
+def board_from_moves(moves, rows=6, cols=7, connect=4):
+    """
+    Plays a list of columns on an empty board, the players taking turns.
+
+    Args:
+        moves (list): The columns in the order they were played.
+        rows (int): Number of rows of the board.
+        cols (int): Number of columns of the board.
+        connect (int): Number of discs in a row needed to win.
+
+    Returns:
+        Board: The board after the moves, with 'PLAYER_PIECE' for the
+        player who started and 'COMPUTER_PIECE' for the other.
+    """
+    board = Board(rows, cols, connect)
+    pieces = (PLAYER_PIECE, COMPUTER_PIECE)
+    for turn, col in enumerate(moves):
+        board.add_piece(board.get_next_open_row(col), col, pieces[turn % 2])
+    return board
+
+
+def percentile(values, percent):
+    """
+    Returns the nearest-rank percentile of a list of numbers.
+
+    Args:
+        values (list): The numbers, in any order.
+        percent (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile, or 0.0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def run_self_play(first, second, games=100, processes=None, seed=0,
+                  swap_sides=True, rows=6, cols=7, connect=4):
+    """
+    Plays many headless games between two move providers in parallel.
+
+    Games are spread over a 'multiprocessing' pool. By default the
+    providers take turns starting, so neither profits from always
+    having the first move. The final positions of all games are then
+    checked at once with 'evaluate_positions', which uses the NumPy
+    batch win detection when NumPy is installed, and compared with the
+    winners the games reported.
+
+    Args:
+        first (callable): The first move provider.
+        second (callable): The second move provider.
+        games (int): Number of games to play.
+        processes (int): Number of worker processes, defaults to the
+        number of CPUs.
+        seed (int): Base random seed, each game uses 'seed' plus its
+        number so runs can be repeated.
+        swap_sides (bool): True to alternate which provider starts.
+        rows (int): Number of rows of the board.
+        cols (int): Number of columns of the board.
+        connect (int): Number of discs in a row needed to win.
+
+    Returns:
+        dict: A report with the number of games, the run time, games
+        per second, wins of each provider, draws, the average game
+        length, per-move latency percentiles in milliseconds and the
+        number of games whose final position disagrees with their
+        reported winner, which should be 0.
+    """
+    processes = processes or os.cpu_count() or 1
+    tasks = [(first, second, number, seed, swap_sides, rows, cols, connect)
+             for number in range(games)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(_self_play_game, tasks,
+                           chunksize=max(1, games // (8 * processes)))
+    elapsed = time.perf_counter() - start
+
+    final_boards = [board_from_moves(result["moves"], rows, cols, connect)
+                    for result in results]
+    mismatches = 0
+    for number, (result, winner) in enumerate(
+            zip(results, evaluate_positions(final_boards))):
+        if winner is not None and swap_sides and number % 2 == 1:
+            winner = 1 - winner
+        if winner != result["winner"]:
+            mismatches += 1
+
+    wins = [0, 0]
+    draws = 0
+    latencies = ([], [])
+    for result in results:
+        if result["winner"] is None:
+            draws += 1
+        else:
+            wins[result["winner"]] += 1
+        for player in (0, 1):
+            latencies[player].extend(result["latencies"][player])
+
+    return {
+        "games": games,
+        "seconds": elapsed,
+        "games_per_second": games / elapsed if elapsed else 0.0,
+        "wins": wins,
+        "draws": draws,
+        "average_moves": (sum(len(result["moves"]) for result in results)
+                          / games if games else 0.0),
+        "latency_ms": [
+            {f"p{pct}": percentile(latencies[player], pct) * 1000
+             for pct in (50, 95, 99)}
+            for player in (0, 1)
+        ],
+        "mismatches": mismatches,
+    }
+
+
+def print_self_play_report(report, names=("first", "second")):
+    """
+    Prints the report of 'run_self_play'.
+
+    Args:
+        report (dict): The report to print.
+        names (tuple): Display names of the two move providers.
+    """
+    print(f"Games: {report['games']} in {report['seconds']:.2f}s "
+          f"({report['games_per_second']:.1f} games/s)")
+    print(f"Average game length: {report['average_moves']:.1f} moves")
+    for player, name in enumerate(names):
+        latency = report["latency_ms"][player]
+        print(f"{name:<10} wins: {report['wins'][player]:<6} "
+              f"move latency p50 {latency['p50']:.2f}ms "
+              f"p95 {latency['p95']:.2f}ms p99 {latency['p99']:.2f}ms")
+    print(f"Draws: {report['draws']}")
+    if report["mismatches"]:
+        print(Fore.RED + f"{report['mismatches']} final positions disagree "
+              "with the reported winner" + Style.RESET_ALL)
+
+
+# Game records
+
+
+class GameRecord:
+    """
+    A finished or abandoned game in a compact, replayable form.
+
+    Moves are kept as a string with one character per move, the column
+    written as a base-36 digit ('0'-'9', then 'a'-'j' for boards wider
+    than ten columns), so a full 6x7 game takes 42 characters.
+
+    Attributes:
+        players (list): Names of the first and second player.
+        pieces (list): Piece codes of the first and second player.
+        rows (int): Number of rows of the board.
+        cols (int): Number of columns of the board.
+        connect (int): Number of pieces in a row needed to win.
+        moves (str): The columns played, starting with the first player.
+        started (float): Unix time the game started.
+        finished (float): Unix time the game ended.
+        result (str): "win", "draw" or "quit".
+        winner (int): 0 or 1 for the winning player, None otherwise.
+        difficulty (str): Difficulty level of the computer player, None
+        for two-player games.
+    """
+
+    MOVE_DIGITS = "0123456789abcdefghij"
+    RESULTS = ("win", "draw", "quit")
+
+    def __init__(self, players, pieces, rows, cols, connect, moves,
+                 started, finished, result, winner=None, difficulty=None):
+        """
+        Initializes a record from its fields.
+
+        Args:
+            players (list): Names of the first and second player.
+            pieces (list): Piece codes of the first and second player.
+            rows (int): Number of rows of the board.
+            cols (int): Number of columns of the board.
+            connect (int): Number of pieces in a row needed to win.
+            moves (str): The columns played as base-36 digits.
+            started (float): Unix time the game started.
+            finished (float): Unix time the game ended.
+            result (str): "win", "draw" or "quit".
+            winner (int): 0 or 1 for the winning player, None otherwise.
+            difficulty (str): Difficulty level of the computer player.
+        """
+        self.players = list(players)
+        self.pieces = list(pieces)
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.moves = moves
+        self.started = started
+        self.finished = finished
+        self.result = result
+        self.winner = winner
+        self.difficulty = difficulty
+
+    @classmethod
+    def from_board(cls, board, players, pieces, started, difficulty=None,
+                   quit_game=False):
+        """
+        Records the game played on a board.
+
+        The result is read from the board itself: the last move either
+        won, filled the board or the game was left early.
+
+        Args:
+            board (Board): The board the game was played on.
+            players (list): Names of the first and second player.
+            pieces (list): Piece codes of the first and second player,
+            which the board only knows once both have played.
+            started (float): Unix time the game started.
+            difficulty (str): Difficulty level of the computer player.
+            quit_game (bool): True if a player quit before the end.
+
+        Returns:
+            GameRecord: The record of the game.
+        """
+        moves = board.bitboard.moves
+        winner = None
+        if quit_game:
+            result = "quit"
+        elif moves and board.check_win_at(moves[-1][0], moves[-1][1]):
+            result = "win"
+            winner = moves[-1][2]
+        else:
+            result = "draw"
+        return cls(players, pieces, board.rows, board.cols, board.connect,
+                   "".join(cls.MOVE_DIGITS[move[1]] for move in moves),
+                   round(started, 3), round(time.time(), 3), result,
+                   winner, difficulty)
+
+    def columns(self):
+        """
+        Returns the moves as column indexes.
+
+        Returns:
+            list: The columns played, starting with the first player.
+        """
+        return [self.MOVE_DIGITS.index(move) for move in self.moves]
+
+    def to_line(self):
+        """
+        Serializes the record as one line of JSON.
+
+        Returns:
+            str: The record, ending with a newline.
+        """
+        return json.dumps({
+            "players": self.players, "pieces": self.pieces,
+            "rows": self.rows, "cols": self.cols, "connect": self.connect,
+            "moves": self.moves, "started": self.started,
+            "finished": self.finished, "result": self.result,
+            "winner": self.winner, "difficulty": self.difficulty,
+        }, separators=(",", ":")) + "\n"
+
+    @classmethod
+    def from_line(cls, line):
+        """
+        Parses a record written by 'to_line'.
+
+        Args:
+            line (str): One line of JSON.
+
+        Returns:
+            GameRecord: The parsed record.
+
+        Raises:
+            ValueError: If the line is not a valid game record, including
+            a board size the game does not support, a column outside the
+            board or a move into a full column.
+        """
+        try:
+            data = json.loads(line)
+            record = cls(data["players"], data["pieces"], data["rows"],
+                         data["cols"], data["connect"], data["moves"],
+                         data["started"], data["finished"], data["result"],
+                         data.get("winner"), data.get("difficulty"))
+            valid = (len(record.players) == 2 and len(record.pieces) == 2
+                     and record.result in cls.RESULTS
+                     and record.winner in (None, 0, 1)
+                     and isinstance(record.moves, str))
+        except (KeyError, TypeError) as error:
+            raise ValueError(f"Invalid game record: {error}") from error
+        if not valid:
+            raise ValueError("Invalid game record")
+        size = (record.rows, record.cols, record.connect)
+        if (not all(type(value) is int for value in size)
+                or not 1 <= record.rows <= len(cls.MOVE_DIGITS)
+                or not 1 <= record.cols <= len(cls.MOVE_DIGITS)
+                or not 2 <= record.connect <= max(record.rows, record.cols)):
+            raise ValueError(f"Invalid board size in game record: {size}")
+        heights = [0] * record.cols
+        for number, move in enumerate(record.moves, start=1):
+            col = cls.MOVE_DIGITS.find(move)
+            if not 0 <= col < record.cols:
+                raise ValueError(f"Move {number} of game record is outside "
+                                 f"the board: {move!r}")
+            heights[col] += 1
+            if heights[col] > record.rows:
+                raise ValueError(f"Move {number} of game record is in a "
+                                 f"full column: {move!r}")
+        return record
+
+    def replay_board(self):
+        """
+        Returns an empty board matching the recorded game.
+
+        Returns:
+            Board: A board of the recorded size.
+        """
+        return Board(self.rows, self.cols, self.connect)
+
+    def describe(self):
+        """
+        Summarizes the record on one line.
+
+        Returns:
+            str: Date, players, result and number of moves.
+        """
+        date = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.started))
+        if self.result == "win":
+            outcome = f"{self.players[self.winner]} won"
+        elif self.result == "draw":
+            outcome = "draw"
+        else:
+            outcome = "quit"
+        return (f"{date}  {self.players[0]} vs {self.players[1]}  "
+                f"{outcome} after {len(self.moves)} moves")
+
+
+class GameLog:
+    """
+    Appends game records to a JSON lines file with buffered writes.
+
+    Records are held in memory and written in one go once 'buffer_size'
+    of them have piled up, when 'flush' is called and at exit.
+    'record_game' calls 'flush' after every game.
+
+    Attributes:
+        path (str): The log file, or "" to record nothing.
+        buffer_size (int): Number of records kept before writing.
+        pending (list): Serialized records not yet written.
+    """
+
+    def __init__(self, path=GAME_LOG_FILE, buffer_size=16):
+        """
+        Initializes the log without touching the file.
+
+        Args:
+            path (str): The log file, or "" to record nothing.
+            buffer_size (int): Number of records kept before writing.
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def append(self, record):
+        """
+        Adds a record, writing the buffer once it is full.
+
+        Args:
+            record (GameRecord): The record to add.
+        """
+        if not self.path:
+            return
+        with self.lock:
+            self.pending.append(record.to_line())
+            full = len(self.pending) >= self.buffer_size
+        if full:
+            self.flush()
+
+    def extend(self, records):
+        """
+        Adds many records, writing them in chunks of 'buffer_size'.
+
+        Args:
+            records (iterable): The records to add.
+
+        Returns:
+            int: Number of records added.
+        """
+        count = 0
+        for record in records:
+            self.append(record)
+            count += 1
+        self.flush()
+        return count
+
+    def flush(self):
+        """
+        Writes all buffered records to the file. If the file cannot be
+        written the records stay buffered for the next attempt.
+
+        Returns:
+            int: Number of records written.
+        """
+        with self.lock:
+            if not self.pending:
+                return 0
+            try:
+                with open(self.path, "a", encoding="utf-8") as log_file:
+                    log_file.writelines(self.pending)
+            except OSError:
+                return 0
+            count = len(self.pending)
+            self.pending = []
+        return count
+
+    def records(self, skip_invalid=True):
+        """
+        Streams every record of the log, including buffered ones.
+
+        Args:
+            skip_invalid (bool): True to skip lines that are not valid
+            records, so one damaged line does not hide the others.
+
+        Yields:
+            GameRecord: The records in the order they were played.
+        """
+        if not self.path:
+            return
+        self.flush()
+        if os.path.exists(self.path):
+            yield from iter_game_records(self.path, skip_invalid)
+
+
+def iter_game_records(path, skip_invalid=False):
+    """
+    Streams the records of a game log one line at a time, so logs of
+    any size can be analyzed without loading them.
+
+    Args:
+        path (str): The log file, or "-" for standard input.
+        skip_invalid (bool): True to skip lines that are not valid
+        records instead of failing.
+
+    Yields:
+        GameRecord: Each record in the file.
+
+    Raises:
+        ValueError: If a line is not a valid record and 'skip_invalid'
+        is False.
+    """
+    log_file = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for number, line in enumerate(log_file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield GameRecord.from_line(line)
+            except ValueError as error:
+                if not skip_invalid:
+                    raise ValueError(f"{path}:{number}: {error}") from error
+    finally:
+        if log_file is not sys.stdin:
+            log_file.close()
+
+
+GAME_LOG = GameLog(GAME_LOG_FILE)
+atexit.register(GAME_LOG.flush)
+
+
+def record_game(board, players, pieces, started, difficulty=None,
+                quit_game=False):
+    """
+    Adds the game played on a board to the game log and writes it.
+
+    Every game is written at once, because web sessions can be killed
+    without the program ever reaching its exit handlers.
+
+    Args:
+        board (Board): The board the game was played on.
+        players (list): Names of the first and second player.
+        pieces (list): Piece codes of the first and second player.
+        started (float): Unix time the game started.
+        difficulty (str): Difficulty level of the computer player.
+        quit_game (bool): True if a player quit before the end.
+    """
+    if board.bitboard.moves:
+        GAME_LOG.append(GameRecord.from_board(board, players, pieces,
+                                              started, difficulty,
+                                              quit_game))
+        GAME_LOG.flush()
+
+
+def export_games(destination="-", log=GAME_LOG):
+    """
+    Copies the records of a game log to another file or standard output.
+
+    Args:
+        destination (str): The file to write, or "-" for standard output.
+        log (GameLog): The log to read.
+
+    Returns:
+        int: Number of records exported.
+    """
+    output = (sys.stdout if destination == "-"
+              else open(destination, "w", encoding="utf-8"))
+    count = 0
+    try:
+        for record in log.records():
+            output.write(record.to_line())
+            count += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return count
+
+
+def import_games(path, log=GAME_LOG):
+    """
+    Appends the valid records of a file to the game log.
+
+    Args:
+        path (str): The file to read, or "-" for standard input.
+        log (GameLog): The log to add the records to.
+
+    Returns:
+        int: Number of records imported.
+    """
+    return log.extend(iter_game_records(path, skip_invalid=True))
+
+
+def replay_game(record, delay=0.5):
+    """
+    Shows a recorded game move by move without running any players.
+
+    Args:
+        record (GameRecord): The game to replay.
+        delay (float): Seconds to wait between moves.
+    """
+    board = record.replay_board()
+    clear_screen()
+    board.print_board()
+    for turn, col in enumerate(record.columns()):
+        time.sleep(delay)
+        board.add_piece(board.get_next_open_row(col), col,
+                        record.pieces[turn % 2])
+        board.print_board()
+    print(record.describe())
+
+
+# Batch win detection
+
+
+def import_numpy():
+    """
+    Imports NumPy if it is installed.
+
+    NumPy is optional and only imported when batch functions are first
+    used, so it never slows down starting the game.
+
+    Returns:
+        module: The 'numpy' module, or None if it is not installed.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def stack_boards(boards):
+    """
+    Stacks boards into one NumPy array for 'batch_check_wins'.
+
+    Args:
+        boards (list): 'Board' objects of the same size.
+
+    Returns:
+        numpy.ndarray: An int8 array of shape (N, rows, cols) holding 0
+        for empty cells, 1 for the first player's pieces and 2 for the
+        second player's.
+    """
+    np = import_numpy()
+    rows, cols = boards[0].rows, boards[0].cols
+    stacked = np.zeros((len(boards), rows * cols), dtype=np.int8)
+    for number, board in enumerate(boards):
+        codes = np.frombuffer(bytes(board.grid), dtype=np.uint8)
+        for piece, player in board.pieces.items():
+            stacked[number][codes == piece] = player + 1
+    return stacked.reshape(len(boards), rows, cols)
+
+
+def batch_check_wins(boards, connect=4):
+    """
+    Checks many boards for wins at once with vectorized NumPy operations.
+
+    For each of the four directions the player's pieces are ANDed with
+    copies of themselves shifted by one to 'connect - 1' cells, which
+    leaves True at the first cell of every complete line.
+
+    Args:
+        boards (numpy.ndarray): An int8 array of shape (N, rows, cols)
+        with 0 for empty cells, 1 for the first player and 2 for the
+        second, as made by 'stack_boards'.
+        connect (int): Number of pieces in a row needed to win.
+
+    Returns:
+        dict: Boolean arrays 'win' (the first player has a line), 'loss'
+        (the second player has a line) and 'draw' (the board is full and
+        nobody has a line), and 'lines', an int array of shape
+        (N, connect, 2) with the (row, col) cells of a winning line, or
+        -1 where there is none. Lines of the first player are preferred.
+    """
+    np = import_numpy()
+    count, rows, cols = boards.shape
+    found = {}
+    lines = np.full((count, connect, 2), -1, dtype=np.int64)
+    reach = connect - 1
+    for player in (2, 1):
+        pieces = boards == player
+        has_line = np.zeros(count, dtype=bool)
+        for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            height = rows - reach * d_row
+            width = cols - reach * abs(d_col)
+            if height <= 0 or width <= 0:
+                continue
+            first_col = reach if d_col < 0 else 0
+            starts = np.ones((count, height, width), dtype=bool)
+            for step in range(connect):
+                row = step * d_row
+                col = first_col + step * d_col
+                starts &= pieces[:, row:row + height, col:col + width]
+            flat = starts.reshape(count, -1)
+            hits = flat.any(axis=1) & ~has_line
+            if hits.any():
+                start = flat[hits].argmax(axis=1)
+                start_row, start_col = np.divmod(start, width)
+                start_col = start_col + first_col
+                for step in range(connect):
+                    lines[hits, step, 0] = start_row + step * d_row
+                    lines[hits, step, 1] = start_col + step * d_col
+            has_line |= flat.any(axis=1)
+        found[player] = has_line
+    full = (boards != 0).reshape(count, -1).all(axis=1)
+    return {
+        "win": found[1],
+        "loss": found[2],
+        "draw": full & ~found[1] & ~found[2],
+        "lines": lines,
+    }
+
+
+def evaluate_positions(boards):
+    """
+    Finds the winner of many boards.
+
+    Uses 'batch_check_wins' when NumPy is installed and otherwise checks
+    each board with 'Board.check_win', which is the reference version.
+
+    Args:
+        boards (list): 'Board' objects of the same size.
+
+    Returns:
+        list: 0 where the first player has won, 1 where the second has,
+        and None where nobody has.
+    """
+    if not boards:
+        return []
+    if import_numpy() is not None:
+        result = batch_check_wins(stack_boards(boards), boards[0].connect)
+        return [0 if win else 1 if loss else None
+                for win, loss in zip(result["win"].tolist(),
+                                     result["loss"].tolist())]
+    winners = []
+    for board in boards:
+        winner = None
+        for piece, player in board.pieces.items():
+            if board.check_win(piece):
+                winner = player
+                break
+        winners.append(winner)
+    return winners
+
+
+# Create board
+
+
+def create_board(rows=BOARD_ROWS, cols=BOARD_COLS, connect=CONNECT):
+    """
+    Creates a new game board for Connect Four.
+
+    Args:
+        rows (int): Number of rows, defaults to 'BOARD_ROWS'.
+        cols (int): Number of columns, defaults to 'BOARD_COLS'.
+        connect (int): Pieces in a row needed to win, defaults to
+        'CONNECT'.
+
+    Returns:
+        Board: An empty game board.
+    """
+    return Board(rows, cols, connect)
+
+
+# Validation check
+
+
+def is_valid_location(board, col):
+    """
+    Checks if a move can be made in the specified column.
+
+    Args:
+        board (Board): The current game board.
+        col (int): The column index to check.
+
+    Returns:
+        bool: True if the top cell of the column is empty, False otherwise.
+    """
+    return board.is_valid_location(col)
+
+
+# Find next open row
+
+
+def get_next_open_row(board, col):
+    """
+    Finds the next open row in a specified column on the board.
+
+    Args:
+        board (Board): The current game board.
+        col (int): The column index to check.
+
+    Returns:
+        int: The row index of the next open cell, or -1 if the column is full.
+    """
+    row = board.get_next_open_row(col)
+    return -1 if row is None else row
+
+
+# Place piece
+
+
+def place_piece(board, row, col, piece):
+    """
+    Places a piece on the board at the specified row and column.
+
+    Args:
+        board (Board): The game board.
+        row (int): The row index to place the piece.
+        col (int): The column index to place the piece.
+        piece (int): The code of the piece to place on the board.
+    """
+    board.add_piece(row, col, piece)
+
+
+# Classes
+
+
+# Zobrist keys
+
+
+_zobrist_cache = {}
+
+
+def zobrist_keys(size):
+    """
+    Returns a list of random 64-bit keys for Zobrist hashing.
+
+    The keys come from a fixed seed, so the same position always has the
+    same hash, and are shared by all boards of the same size.
+
+    Args:
+        size (int): Number of keys, one per player and cell bit.
+
+    Returns:
+        list: The random keys.
+    """
+    if size not in _zobrist_cache:
+        rng = random.Random(size)
+        _zobrist_cache[size] = [rng.getrandbits(64) for _ in range(size)]
+    return _zobrist_cache[size]
+
+
+# Class BitBoard
+
+
+class BitBoard:
+    """
+    Stores the discs of both players as two integer bitmasks.
+
+    Each column uses 'rows + 1' bits, counted from the bottom cell
+    upwards, with one spare bit on top so that shifts never carry a
+    disc from one column into the next. This keeps a 6x7 board inside
+    a 64-bit integer and makes every operation a few shifts and masks.
+
+    Attributes:
+        rows (int): Number of rows in the game board.
+        cols (int): Number of columns in the game board.
+        connect (int): Number of discs in a row needed to win.
+        masks (list): One bitmask per player holding their discs.
+        heights (list): Number of discs currently in each column.
+        moves (list): Stack of played moves used by 'undo'.
+        hash (int): Zobrist hash of the position, updated on every move.
+    """
+
+    def __init__(self, rows=6, cols=7, connect=4):
+        """
+        Initializes an empty bitboard.
+
+        Args:
+            rows (int): Number of rows in the game board, defaults to 6.
+            cols (int): Number of columns in the game board, defaults to 7.
+            connect (int): Number of discs in a row needed to win,
+            defaults to 4.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.stride = rows + 1
+        self.masks = [0, 0]
+        self.heights = [0] * cols
+        self.moves = []
+        self.zobrist = zobrist_keys(2 * cols * self.stride)
+        self.hash = 0
+
+    def index(self, row, col):
+        """
+        Returns the bit position of a cell given in grid coordinates.
+
+        Args:
+            row (int): The row index, where 0 is the top row.
+            col (int): The column index.
+
+        Returns:
+            int: The position of the cell's bit in a player mask.
+        """
+        return col * self.stride + self.rows - 1 - row
+
+    def copy(self):
+        """
+        Returns an independent copy of the bitboard.
+
+        Returns:
+            BitBoard: A bitboard with the same discs and move history.
+        """
+        bitboard = BitBoard.__new__(BitBoard)
+        bitboard.__dict__.update(self.__dict__)
+        bitboard.masks = list(self.masks)
+        bitboard.heights = list(self.heights)
+        bitboard.moves = list(self.moves)
+        return bitboard
+
+    def bit(self, row, col):
+        """
+        Returns the bit for a cell given in grid coordinates.
+
+        Args:
+            row (int): The row index, where 0 is the top row.
+            col (int): The column index.
+
+        Returns:
+            int: An integer with only the bit of that cell set.
+        """
+        return 1 << self.index(row, col)
+
+    def can_play(self, col):
+        """
+        Checks if a column still has room for a disc.
+
+        Args:
+            col (int): The column index to check.
+
+        Returns:
+            bool: True if the column is not full, False otherwise.
+        """
+        return 0 <= col < self.cols and self.heights[col] < self.rows
+
+    def next_row(self, col):
+        """
+        Returns the grid row a disc dropped into 'col' would land on.
+
+        Args:
+            col (int): The column index to check.
+
+        Returns:
+            int: The row index, or None if the column is full.
+        """
+        if self.heights[col] < self.rows:
+            return self.rows - 1 - self.heights[col]
+        return None
+
+    def set_cell(self, row, col, player):
+        """
+        Puts a disc of 'player' on the given cell.
+
+        Args:
+            row (int): The row index, where 0 is the top row.
+            col (int): The column index.
+            player (int): The player index, 0 or 1.
+        """
+        self.moves.append((row, col, player, self.heights[col]))
+        self.masks[player] |= self.bit(row, col)
+        self.hash ^= self.zobrist[player * self.cols * self.stride
+                                  + self.index(row, col)]
+        self.heights[col] = max(self.heights[col], self.rows - row)
+
+    def play(self, col, player):
+        """
+        Drops a disc of 'player' into a column.
+
+        Args:
+            col (int): The column index.
+            player (int): The player index, 0 or 1.
+
+        Returns:
+            int: The row the disc landed on.
+        """
+        row = self.rows - 1 - self.heights[col]
+        self.set_cell(row, col, player)
+        return row
+
+    def undo(self):
+        """
+        Takes back the most recent move.
+
+        Returns:
+            tuple: The (row, col) of the removed disc.
+        """
+        row, col, player, height = self.moves.pop()
+        self.masks[player] &= ~self.bit(row, col)
+        self.hash ^= self.zobrist[player * self.cols * self.stride
+                                  + self.index(row, col)]
+        self.heights[col] = height
+        return row, col
+
+    def key(self):
+        """
+        Returns a number that identifies the position uniquely.
+
+        Adding the discs of the side to move to the mask of all discs
+        gives a different result for every position, because the carry
+        in each column stops right above its top disc. Player 0 is
+        assumed to have made the first move.
+
+        Returns:
+            int: The position key, which fits in 64 bits for a 6x7 board.
+        """
+        both = self.masks[0] | self.masks[1]
+        return self.masks[len(self.moves) % 2] + both
+
+    def is_full(self):
+        """
+        Checks if every cell of the board is taken.
+
+        Returns:
+            bool: True if no more moves can be played, False otherwise.
+        """
+        return len(self.moves) == self.rows * self.cols
+
+    def is_win_at(self, row, col):
+        """
+        Checks if the disc on the given cell completes a line.
+
+        Only the four lines through that cell are walked, which is all
+        that can change when a single disc is added.
+
+        Args:
+            row (int): The row index, where 0 is the top row.
+            col (int): The column index.
+
+        Returns:
+            bool: True if the disc is part of 'connect' in a row, False
+            otherwise.
+        """
+        bit = self.bit(row, col)
+        mask = self.masks[0] if self.masks[0] & bit else self.masks[1]
+        if not mask & bit:
+            return False
+        for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1
+            for sign in (1, -1):
+                r, c = row + sign * d_row, col + sign * d_col
+                while (0 <= r < self.rows and 0 <= c < self.cols
+                       and mask & self.bit(r, c)):
+                    count += 1
+                    r, c = r + sign * d_row, c + sign * d_col
+            if count >= self.connect:
+                return True
+        return False
+
+    def is_win(self, player):
+        """
+        Checks if 'player' has 'connect' discs in a line.
+
+        Every direction is tested by ANDing the player's mask with copies
+        of itself shifted by one to 'connect - 1' cells, which leaves a
+        bit set only where a complete line starts.
+
+        Args:
+            player (int): The player index, 0 or 1.
+
+        Returns:
+            bool: True if the player has connected enough discs, False
+            otherwise.
+        """
+        mask = self.masks[player]
+        for shift in (1, self.stride, self.stride - 1, self.stride + 1):
+            line = mask
+            for step in range(1, self.connect):
+                line &= mask >> (step * shift)
+                if not line:
+                    break
+            if line:
+                return True
+        return False
+
+
+# Class WinningLines
+
+
+class WinningLines:
+    """
+    Precomputed table of every winning line of cells on a board.
+
+    Cells are numbered row by row from the top, like 'Board.grid'.
+
+    Attributes:
+        rows (int): Number of rows of the board.
+        cols (int): Number of columns of the board.
+        cells (list): The cell numbers of each line.
+        masks (list): The 'BitBoard' bitmask of each line.
+        through (list): For each cell, the numbers of the lines through it.
+    """
+
+    def __init__(self, rows=6, cols=7, connect=4):
+        """
+        Builds the tables for a board size.
+
+        Args:
+            rows (int): Number of rows of the board.
+            cols (int): Number of columns of the board.
+            connect (int): Number of cells in a line.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.cells = []
+        self.masks = []
+        self.through = [[] for _ in range(rows * cols)]
+        reach = connect - 1
+        for row in range(rows):
+            for col in range(cols):
+                for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_row, end_col = row + reach * d_row, col + reach * d_col
+                    if end_row >= rows or not 0 <= end_col < cols:
+                        continue
+                    line = [(row + step * d_row) * cols + col + step * d_col
+                            for step in range(connect)]
+                    for cell in line:
+                        self.through[cell].append(len(self.cells))
+                    self.cells.append(line)
+                    self.masks.append(sum(
+                        1 << ((cell % cols) * (rows + 1)
+                              + rows - 1 - cell // cols)
+                        for cell in line))
+
+
+_winning_lines_cache = {}
+
+
+def get_winning_lines(rows=6, cols=7, connect=4):
+    """
+    Returns the shared 'WinningLines' table for a board size.
+
+    Args:
+        rows (int): Number of rows of the board.
+        cols (int): Number of columns of the board.
+        connect (int): Number of cells in a line.
+
+    Returns:
+        WinningLines: The table, built on first use.
+    """
+    key = (rows, cols, connect)
+    if key not in _winning_lines_cache:
+        _winning_lines_cache[key] = WinningLines(rows, cols, connect)
+    return _winning_lines_cache[key]
+
+
+# Class ThreatMap
+
+
+class ThreatMap:
+    """
+    Keeps track of the empty cells that would complete a line.
+
+    For every line the number of pieces of each player is counted. When
+    a player has all but one cell of a line and the opponent has none,
+    the missing cell is a threat of that player. Both the counts and the
+    threats are updated for just the lines through a cell whenever a
+    piece is added or removed.
+
+    Attributes:
+        lines (WinningLines): The lines of the board.
+        counts (list): Per player, the number of their pieces in each line.
+        threats (list): Per player, how many lines each cell would complete.
+        occupied (bytearray): 1 for each cell that holds a piece.
+    """
+
+    def __init__(self, lines):
+        """
+        Initializes the map for an empty board.
+
+        Args:
+            lines (WinningLines): The lines of the board.
+        """
+        self.lines = lines
+        self.connect = len(lines.cells[0]) if lines.cells else 0
+        cell_count = lines.rows * lines.cols
+        self.counts = [[0] * len(lines.cells), [0] * len(lines.cells)]
+        self.threats = [[0] * cell_count, [0] * cell_count]
+        self.occupied = bytearray(cell_count)
+
+    def copy(self):
+        """
+        Returns an independent copy of the map.
+
+        Returns:
+            ThreatMap: A map with the same counts and threats.
+        """
+        threat_map = ThreatMap.__new__(ThreatMap)
+        threat_map.lines = self.lines
+        threat_map.connect = self.connect
+        threat_map.counts = [list(counts) for counts in self.counts]
+        threat_map.threats = [list(threats) for threats in self.threats]
+        threat_map.occupied = bytearray(self.occupied)
+        return threat_map
+
+    def add(self, cell, player):
+        """
+        Records a piece of 'player' on a cell.
+
+        Args:
+            cell (int): The cell number.
+            player (int): The player index, 0 or 1.
+        """
+        other = 1 - player
+        self.occupied[cell] = 1
+        for line in self.lines.through[cell]:
+            own, their = self.counts[player][line], self.counts[other][line]
+            if their == 0 and own == self.connect - 1:
+                self.threats[player][cell] -= 1
+            if own == 0 and their == self.connect - 1:
+                self.threats[other][cell] -= 1
+            self.counts[player][line] = own + 1
+            if their == 0 and own + 1 == self.connect - 1:
+                self.threats[player][self.missing_cell(line)] += 1
+
+    def remove(self, cell, player):
+        """
+        Takes back a piece of 'player' from a cell.
+
+        Args:
+            cell (int): The cell number.
+            player (int): The player index, 0 or 1.
+        """
+        other = 1 - player
+        for line in self.lines.through[cell]:
+            own = self.counts[player][line] - 1
+            their = self.counts[other][line]
+            if their == 0 and own + 1 == self.connect - 1:
+                self.threats[player][self.missing_cell(line)] -= 1
+            self.counts[player][line] = own
+            if own == 0 and their == self.connect - 1:
+                self.threats[other][cell] += 1
+            if their == 0 and own == self.connect - 1:
+                self.threats[player][cell] += 1
+        self.occupied[cell] = 0
+
+    def missing_cell(self, line):
+        """
+        Returns the empty cell of a line that is one piece short.
+
+        Args:
+            line (int): The line number.
+
+        Returns:
+            int: The cell number.
+        """
+        for cell in self.lines.cells[line]:
+            if not self.occupied[cell]:
+                return cell
+        return None
+
+    def is_threat(self, cell, player):
+        """
+        Checks if a piece of 'player' on a cell would complete a line.
+
+        Args:
+            cell (int): The cell number.
+            player (int): The player index, 0 or 1.
+
+        Returns:
+            bool: True if the cell is an empty threat cell of 'player'.
+        """
+        return self.threats[player][cell] > 0 and not self.occupied[cell]
+
+    def winning_columns(self, player, heights):
+        """
+        Lists the columns where 'player' wins with their next piece.
+
+        Args:
+            player (int): The player index, 0 or 1.
+            heights (list): Number of pieces in each column.
+
+        Returns:
+            list: The winning column indexes.
+        """
+        rows, cols = self.lines.rows, self.lines.cols
+        return [col for col, height in enumerate(heights)
+                if height < rows
+                and self.is_threat((rows - 1 - height) * cols + col, player)]
+
+    def parity_threats(self, player):
+        """
+        Counts a player's threats by the row they are on.
+
+        Threats on odd rows, counted from the bottom starting at 1, tend
+        to help the first player at the end of the game and threats on
+        even rows the second player.
+
+        Args:
+            player (int): The player index, 0 or 1.
+
+        Returns:
+            dict: The number of 'odd' and 'even' threat cells.
+        """
+        rows, cols = self.lines.rows, self.lines.cols
+        result = {"odd": 0, "even": 0}
+        for cell, count in enumerate(self.threats[player]):
+            if count and not self.occupied[cell]:
+                row_from_bottom = rows - cell // cols
+                result["odd" if row_from_bottom % 2 else "even"] += 1
+        return result
+
+
+# Class board
+
+
+class Board:
+    """
+    Represents the game board for Connect Four.
+
+    The game state lives in a 'BitBoard'. The 'grid' is kept alongside
+    it for drawing the board and holds one piece code per cell, such as
+    'PLAYER_PIECE'. Colors are only added when the board is drawn.
+
+    Attributes:
+        rows (int): Number of rows in the game board.
+        cols (int): Number of columns in the game board.
+        connect (int): Number of pieces in a row needed to win.
+        grid (bytearray): The piece code of every cell, row by row from
+        the top, with 'EMPTY' for empty cells.
+        bitboard (BitBoard): The bitmask representation of the board.
+        threats (ThreatMap): The cells that would complete a line.
+        pieces (dict): Maps each piece code to its player index.
+    """
+
+    def __init__(self, rows=6, cols=7, connect=4):
+        """
+        Initializes a new game board with the specified number of rows
+        and columns.
+
+        Args:
+            rows (int): Number of rows in the game board, defaults to 6.
+            cols (int): Number of columns in the game board, defaults to 7.
+            connect (int): Number of pieces in a row needed to win,
+            defaults to 4.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.grid = bytearray(rows * cols)
+        self.bitboard = BitBoard(rows, cols, connect)
+        self.threats = ThreatMap(get_winning_lines(rows, cols, connect))
+        self.pieces = {}
+
+    def cell(self, row, col):
+        """
+        Returns the piece code on a cell.
+
+        Args:
+            row (int): The row index.
+            col (int): The column index.
+
+        Returns:
+            int: The piece code, 'EMPTY' if there is no piece.
+        """
+        return self.grid[row * self.cols + col]
+
+    def player_index(self, piece):
+        """
+        Returns the bitboard player index for a piece code.
+
+        The first piece seen becomes player 0 and the second player 1.
+
+        Args:
+            piece (int): The code of the player's piece.
+
+        Returns:
+            int: The player index, 0 or 1.
+        """
+        if piece not in self.pieces:
+            self.pieces[piece] = len(self.pieces)
+        return self.pieces[piece]
+
+    def add_piece(self, row, col, piece):
+        """
+        Adds a piece to the specified location on the board.
+
+        Args:
+            row (int): The row index to place the piece.
+            col (int): The column index to place the piece.
+            piece (int): The code of the player's piece.
+        """
+        player = self.player_index(piece)
+        self.bitboard.set_cell(row, col, player)
+        self.threats.add(row * self.cols + col, player)
+        self.grid[row * self.cols + col] = piece
+
+    def undo_piece(self):
+        """
+        Removes the most recently added piece from the board.
+        """
+        player = self.bitboard.moves[-1][2]
+        row, col = self.bitboard.undo()
+        self.threats.remove(row * self.cols + col, player)
+        self.grid[row * self.cols + col] = EMPTY
+
+    def winning_columns(self, piece):
+        """
+        Lists the columns where a piece would win the game right now.
+
+        Args:
+            piece (int): The code of the player's piece.
+
+        Returns:
+            list: The column indexes, empty if the piece has not been
+            played yet or has no winning move.
+        """
+        if piece not in self.pieces:
+            return []
+        return self.threats.winning_columns(self.pieces[piece],
+                                            self.bitboard.heights)
+
+    def copy(self):
+        """
+        Returns an independent copy of the board.
+
+        Returns:
+            Board: A board with the same pieces and move history.
+        """
+        board = Board.__new__(Board)
+        board.rows = self.rows
+        board.cols = self.cols
+        board.connect = self.connect
+        board.grid = bytearray(self.grid)
+        board.bitboard = self.bitboard.copy()
+        board.threats = self.threats.copy()
+        board.pieces = dict(self.pieces)
+        return board
+
+    def to_bytes(self):
+        """
+        Packs the board into a few bytes.
+
+        The first five bytes hold the board size, the number of pieces
+        in a row needed to win and the codes of the first and second
+        player, followed by two bits per cell.
+
+        Returns:
+            bytes: The packed board, 16 bytes for a 6x7 board.
+        """
+        order = sorted(self.pieces, key=self.pieces.get) + [EMPTY, EMPTY]
+        packed = bytearray([self.rows, self.cols, self.connect,
+                            order[0], order[1]])
+        for start in range(0, len(self.grid), 4):
+            value = 0
+            for offset, code in enumerate(self.grid[start:start + 4]):
+                value |= code << (2 * offset)
+            packed.append(value)
+        return bytes(packed)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Rebuilds a board packed by 'to_bytes'.
+
+        Pieces are replayed column by column from the bottom, so the
+        position is the same but the move history is not.
+
+        Args:
+            data (bytes): The packed board.
+
+        Returns:
+            Board: The unpacked board.
+        """
+        rows, cols, connect, first, second = data[:5]
+        board = cls(rows, cols, connect)
+        for code in (first, second):
+            if code != EMPTY:
+                board.player_index(code)
+        for col in range(cols):
+            for row in range(rows - 1, -1, -1):
+                index = row * cols + col
+                code = (data[5 + index // 4] >> (2 * (index % 4))) & 3
+                if code != EMPTY:
+                    board.add_piece(row, col, code)
+        return board
+
+    def is_valid_location(self, col):
+        """
+        Checks if a column can accept a new piece.
+
+        Args:
+            col (int): The column index to check.
+
+        Returns:
+            bool: True if the top cell of the column is empty, False otherwise.
+        """
+        return self.bitboard.can_play(col)
+
+    def get_next_open_row(self, col):
+        """
+        Finds the next open row in the given column.
+
+        Args:
+            col (int): The column index to check.
+
+        Returns:
+            int: The row index of the next open cell in the specified column,
+            or None if the column is full.
+        """
+        return self.bitboard.next_row(col)
+
+    def is_full(self):
+        """
+        Checks if the board has no empty cells left.
+
+        Returns:
+            bool: True if the game can only end in a tie, False otherwise.
+        """
+        return self.bitboard.is_full()
+
+    @profiled("render.print_board")
+    def print_board(self):
+        """
+        Displays the game board in a readable format.
+
+        Drawing is done by 'BOARD_RENDERER', which only repaints the
+        cells that changed since the board was last shown.
+
+        Returns:
+            None
+        """
+        BOARD_RENDERER.render(self)
+
+    def check_win(self, piece):
+        """
+        Checks if the current board has a winning condition for the
+        specified piece.
+
+        Args:
+            piece (int): The code of the player's piece to check for
+            a win.
+
+        Returns:
+            bool: True if there is a sequence of 'connect' same pieces in
+            a row, column, or diagonal; False otherwise.
+        """
+        if piece not in self.pieces:
+            return False
+        return self.bitboard.is_win(self.pieces[piece])
+
+    def check_win_at(self, row, col):
+        """
+        Checks if the piece on the given cell has just won the game.
+
+        Args:
+            row (int): The row index of the piece that was placed last.
+            col (int): The column index of the piece that was placed last.
+
+        Returns:
+            bool: True if that piece is part of 'connect' in a row,
+            column, or diagonal; False otherwise.
+        """
+        return self.bitboard.is_win_at(row, col)
+
+
+# Class BoardRenderer
+
+
+class BoardRenderer:
+    """
+    Draws the game board with ANSI escape codes, repainting only what
+    changed.
+
+    The first frame of a board clears the screen and draws everything.
+    Later frames move the cursor to each changed cell and rewrite just
+    that cell. Either way the frame is built in one string and written
+    with a single 'sys.stdout.write'. A full redraw happens again when
+    another board is shown, the terminal is resized or the screen has
+    been cleared. Boards too tall to fit on the screen together with the
+    prompt below them are always redrawn in full, because the screen
+    scrolls and the cursor positions of the cells would be wrong.
+
+    Attributes:
+        board (Board): The board shown by the last frame.
+        cells (bytes): The piece codes shown by the last frame.
+        size (os.terminal_size): The terminal size of the last frame.
+    """
+
+    CLEAR = "\x1b[H\x1b[2J"
+    CLEAR_BELOW = "\x1b[J"
+    FIRST_CELL_ROW = 3
+    PROMPT_LINES = 4
+
+    def __init__(self):
+        """
+        Initializes a renderer that has not drawn anything yet.
+        """
+        self.board = None
+        self.cells = None
+        self.size = None
+
+    def invalidate(self):
+        """
+        Forgets the last frame, so the next one is a full redraw.
+        """
+        self.board = None
+        self.cells = None
+
+    def render(self, board):
+        """
+        Shows a board on the screen.
+
+        Args:
+            board (Board): The board to show.
+        """
+        size = shutil.get_terminal_size()
+        if (board is not self.board or size != self.size
+                or not self.fits(board, size)):
+            frame = self.full_frame(board)
+        else:
+            frame = self.changed_cells(board)
+        self.board = board
+        self.cells = bytes(board.grid)
+        self.size = size
+        sys.stdout.write(frame)
+        sys.stdout.flush()
+
+    def full_frame(self, board):
+        """
+        Builds a frame that clears the screen and draws the whole board.
+
+        Args:
+            board (Board): The board to draw.
+
+        Returns:
+            str: The frame, leaving the cursor below the board.
+        """
+        width = self.cell_width(board)
+        border = "-" * ((width + 1) * board.cols + 1)
+        lines = [" " + " ".join(str(col + 1).ljust(width)
+                                for col in range(board.cols)),
+                 border]
+        padding = " " * (width - 1)
+        for row in range(board.rows):
+            lines.append("|" + "|".join(
+                PIECE_SYMBOLS[board.cell(row, col)] + padding
+                for col in range(board.cols)) + "|")
+        lines.extend([border, "", ""])
+        return self.CLEAR + "\n".join(lines)
+
+    def fits(self, board, size):
+        """
+        Checks whether a board and the prompt below it fit on the screen.
+
+        Args:
+            board (Board): The board to draw.
+            size (os.terminal_size): The terminal size.
+
+        Returns:
+            bool: True if the screen does not scroll while the board is
+            shown.
+        """
+        last_line = self.FIRST_CELL_ROW + board.rows + 1 + self.PROMPT_LINES
+        return last_line <= size.lines
+
+    @staticmethod
+    def cell_width(board):
+        """
+        Returns how many characters wide a cell is drawn.
+
+        Cells are as wide as the largest column number, so the numbers
+        above the board stay aligned on boards with ten or more columns.
+
+        Args:
+            board (Board): The board to draw.
+
+        Returns:
+            int: The cell width.
+        """
+        return len(str(board.cols))
+
+    def changed_cells(self, board):
+        """
+        Builds a frame that rewrites only the cells that changed.
+
+        Args:
+            board (Board): The board to draw.
+
+        Returns:
+            str: The frame, leaving the cursor below the board with the
+            rest of the screen cleared for new messages.
+        """
+        width = self.cell_width(board)
+        parts = []
+        for index, (old, new) in enumerate(zip(self.cells, board.grid)):
+            if old != new:
+                row, col = divmod(index, board.cols)
+                parts.append(f"\x1b[{self.FIRST_CELL_ROW + row};"
+                             f"{2 + (width + 1) * col}H{PIECE_SYMBOLS[new]}")
+        below = self.FIRST_CELL_ROW + board.rows + 2
+        parts.append(f"\x1b[{below};1H{self.CLEAR_BELOW}")
+        return "".join(parts)
+
+
+BOARD_RENDERER = BoardRenderer()
+
+
+# Class Player
+
+
+class Player:
+    """
+    Represents a player in the Connect Four game.
+
+    Attributes:
+        name (str): The name of the player.
+        games_won (int): The number of games won by the player.
+        games_lost (int): The number of games lost by the player.
+    """
+
+    def __init__(self, name):
+        """
+        Initializes a new Player instance.
+
+        Args:
+            name (str): The name of the player.
+        """
+        self.name = name
+        self.games_won = 0
+        self.games_lost = 0
+
+    def record_win(self):
+        """
+        Records a win for the player by incrementing their win count.
+        """
+        self.games_won += 1
+
+    def record_loss(self):
+        """
+        Records a loss for the player by incrementing their loss count.
+        """
+        self.games_lost += 1
+
+    def greet(self):
+        """
+        Greets the player with a welcome message including their current
+        game statistics.
+
+        Displays a customized greeting based on the player's game history,
+        showing the number of games won and lost.
+        """
+        if self.games_won > 0 or self.games_lost > 0:
+            print(Fore.CYAN + f"Welcome back, {self.name}!")
+            print(Fore.GREEN + f"Won Games: {self.games_won}")
+            print(Fore.RED + f"Lost Games: {self.games_lost}\n")
+        else:
+            print(Fore.CYAN + f"Welcome, {self.name}! "
+                              "Good luck on your first game!\n")
+        print(Style.RESET_ALL)
+
+
+# Class RankingIndex
+
+
+class RankingIndex:
+    """
+    Keeps players sorted by each leaderboard order.
+
+    Every order is a sorted list of (sort key, record key) pairs, so a
+    changed record is moved with two binary searches instead of sorting
+    all players again, and a page is a slice of the list.
+
+    Attributes:
+        entries (dict): Maps record keys to (name, won, lost) tuples.
+        ranked (dict): Maps each order in 'ORDERS' to its sorted list.
+    """
+
+    ORDERS = {"wins": "Wins", "win_rate": "Win rate",
+              "games": "Games played"}
+
+    def __init__(self):
+        """
+        Initializes an empty index.
+        """
+        self.entries = {}
+        self.ranked = {order: [] for order in self.ORDERS}
+
+    @staticmethod
+    def sort_key(order, name, won, lost):
+        """
+        Returns the key a player is sorted by, smallest first.
+
+        Ties are broken by the other counts and then by name, the same
+        way 'SQLitePlayerStore' sorts.
+
+        Args:
+            order (str): A key of 'ORDERS'.
+            name (str): The player's name.
+            won (int): Games won.
+            lost (int): Games lost.
+
+        Returns:
+            tuple: The sort key.
+        """
+        games = won + lost
+        if order == "wins":
+            return (-won, lost, name.lower())
+        if order == "win_rate":
+            return (-(won / games if games else 0.0), -games, name.lower())
+        return (-games, -won, name.lower())
+
+    def rebuild(self, records):
+        """
+        Builds the index from scratch.
+
+        Args:
+            records (dict): Maps record keys to [name, won, lost] lists.
+        """
+        self.entries = {key: tuple(record) for key, record in records.items()}
+        for order in self.ORDERS:
+            self.ranked[order] = sorted(
+                (self.sort_key(order, *record), key)
+                for key, record in self.entries.items())
+
+    def update(self, key, name, won, lost):
+        """
+        Adds a player or moves them to their new place in every order.
+
+        Args:
+            key: The record key of the player.
+            name (str): The player's name.
+            won (int): Games won.
+            lost (int): Games lost.
+        """
+        old = self.entries.get(key)
+        for order, ranked in self.ranked.items():
+            if old is not None:
+                item = (self.sort_key(order, *old), key)
+                del ranked[bisect.bisect_left(ranked, item)]
+            bisect.insort(ranked, (self.sort_key(order, name, won, lost), key))
+        self.entries[key] = (name, won, lost)
+
+    def page(self, order="wins", page=0, page_size=10, search=""):
+        """
+        Returns one page of the leaderboard.
+
+        Args:
+            order (str): A key of 'ORDERS'.
+            page (int): The page number, starting at 0.
+            page_size (int): Players per page.
+            search (str): Only players whose name contains this text,
+            ignoring case, are listed. They keep their overall rank.
+
+        Returns:
+            dict: The page, as described in 'PlayerStore.leaderboard'.
+        """
+        ranked = self.ranked[order]
+        if search:
+            needle = search.lower()
+            matches = [(rank, key)
+                       for rank, (_, key) in enumerate(ranked, start=1)
+                       if needle in self.entries[key][0].lower()]
+            total = len(matches)
+        else:
+            matches = None
+            total = len(ranked)
+        pages = max(1, -(-total // page_size))
+        page = min(max(page, 0), pages - 1)
+        start = page * page_size
+        if matches is None:
+            selected = [(rank, key) for rank, (_, key) in enumerate(
+                ranked[start:start + page_size], start=start + 1)]
+        else:
+            selected = matches[start:start + page_size]
+        return leaderboard_page(
+            [(rank,) + self.entries[key] for rank, key in selected],
+            order, page, pages, total)
+
+
+def leaderboard_page(players, order, page, pages, total):
+    """
+    Builds the result of 'PlayerStore.leaderboard'.
+
+    Args:
+        players (list): (rank, name, won, lost) tuples of the page.
+        order (str): A key of 'RankingIndex.ORDERS'.
+        page (int): The page number, starting at 0.
+        pages (int): Number of pages.
+        total (int): Number of players listed on all pages.
+
+    Returns:
+        dict: The page.
+    """
+    return {
+        "order": order,
+        "page": page,
+        "pages": pages,
+        "total": total,
+        "players": [
+            {"rank": rank, "player_name": name, "games_won": won,
+             "games_lost": lost}
+            for rank, name, won, lost in players
+        ],
+    }
+
+
+# Class PlayerStore
+
+
+class PlayerStore(abc.ABC):
+    """
+    Interface of the storage that keeps the players' win-loss records.
+
+    Each record is identified by a key returned from 'find' or 'add',
+    which is what 'Player.index' holds. The methods without a default
+    are abstract, so a storage that lacks one cannot be created.
+    """
+
+    def load(self):
+        """
+        Prepares the store for lookups. Stores that need no preparation
+        have nothing to do.
+        """
+
+    def reload(self):
+        """
+        Picks up changes other processes made since 'load'. Stores that
+        always read the current data have nothing to do.
+        """
+
+    @abc.abstractmethod
+    def find(self, player_name):
+        """
+        Looks up a player by name, ignoring case.
+
+        Args:
+            player_name (str): The name to look up.
+
+        Returns:
+            tuple: The record key and a [name, won, lost] list, or None
+            if the player is not stored.
+        """
+
+    @abc.abstractmethod
+    def add(self, player_name):
+        """
+        Adds a player with no games.
+
+        Args:
+            player_name (str): The name of the new player.
+
+        Returns:
+            The key of the new record.
+        """
+
+    @abc.abstractmethod
+    def increment(self, key, won):
+        """
+        Adds one win or one loss to a record.
+
+        Args:
+            key: The key of the record.
+            won (bool): True to count a win, False to count a loss.
+        """
+
+    @abc.abstractmethod
+    def records(self):
+        """
+        Returns every player as a dictionary with the keys 'player_name',
+        'games_won' and 'games_lost'.
+        """
+
+    @abc.abstractmethod
+    def top(self, count=10):
+        """
+        Returns up to 'count' player dictionaries, most wins first.
+        """
+
+    @abc.abstractmethod
+    def leaderboard(self, order="wins", page=0, page_size=10, search=""):
+        """
+        Returns one page of the players ranked by 'order'.
+
+        Args:
+            order (str): "wins", "win_rate" or "games".
+            page (int): The page number, starting at 0. Pages past the
+            end show the last page.
+            page_size (int): Players per page.
+            search (str): Only players whose name contains this text,
+            ignoring case, are listed. They keep their overall rank.
+
+        Returns:
+            dict: 'order', 'page', 'pages', 'total' (players on all
+            pages) and 'players', a list of dictionaries with 'rank',
+            'player_name', 'games_won' and 'games_lost'.
+        """
+
+    def flush(self):
+        """
+        Writes any pending changes. Stores that save every change
+        immediately have nothing to do.
+
+        Returns:
+            int: Number of records written.
+        """
+        return 0
+
+    def flush_in_background(self):
+        """
+        Starts 'flush' on a background thread so the game does not wait
+        for it.
+
+        Returns:
+            threading.Thread: The started thread.
+        """
+        thread = threading.Thread(target=self._flush_quietly, daemon=True)
+        thread.start()
+        return thread
+
+    def _flush_quietly(self):
+        """
+        Runs 'flush' and keeps failed records pending instead of raising.
+        """
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+    def flush_and_report(self):
+        """
+        Runs 'flush' and prints an error message if it fails.
+        """
+        try:
+            self.flush()
+        except Exception as e:
+            print(Fore.RED + f"Could not save the Hall of Fame: {e}" +
+                  Style.RESET_ALL)
+
+
+# Class TokenBucket
+
+
+class TokenBucket:
+    """
+    Limits how often requests are sent.
+
+    The bucket holds up to 'capacity' tokens and gains 'rate' tokens per
+    second. Every request takes one token and waits while there is none,
+    so bursts are allowed but the average rate is never exceeded.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float): Most tokens the bucket holds.
+        tokens (float): Tokens left, negative while requests are waiting
+        for tokens they have already taken.
+    """
+
+    def __init__(self, rate, capacity):
+        """
+        Initializes a full bucket.
+
+        Args:
+            rate (float): Tokens added per second.
+            capacity (float): Most tokens the bucket holds.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """
+        Takes a token, waiting until the bucket has one.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+# Class SheetScheduler
+
+
+class SheetScheduler:
+    """
+    Wraps a worksheet to send its API requests within the Sheets quota.
+
+    The worksheet is either given or opened on first use by 'open_sheet'.
+    Every request, including opening the worksheet, first takes a token
+    from a 'TokenBucket' that refills at the quota rate and allows only
+    a small burst. Requests rejected with status 429 (quota exceeded) are
+    retried with exponential backoff and random jitter, as are requests
+    that failed with a 5xx status or a network error if repeating them
+    does no harm. Identical reads made at the same time are coalesced
+    into one request whose result all callers share.
+
+    Opening the worksheet is retried like a read. Once it has failed,
+    later attempts are made only once each, so a player without a
+    connection does not wait for the backoff again on every flush.
+
+    Attributes:
+        sheet: The wrapped worksheet, or None until it is opened.
+        open_sheet (callable): Opens the worksheet, or None.
+        open_failed (bool): True after opening the worksheet failed.
+        bucket (TokenBucket): The rate limit of all requests.
+        retries (int): Most retries of one request.
+        base_delay (float): Seconds before the first retry, doubled for
+        every further retry.
+        max_delay (float): Most seconds before one retry.
+    """
+
+    READ_METHODS = frozenset({"get_all_values", "get_all_records",
+                              "row_values", "col_values", "find",
+                              "batch_get"})
+    IDEMPOTENT_METHODS = READ_METHODS | {"batch_update", "update_cell",
+                                         "open_sheet"}
+
+    def __init__(self, sheet=None,
+                 requests_per_minute=SHEETS_REQUESTS_PER_MINUTE,
+                 burst=SHEETS_BURST, retries=5, base_delay=1.0,
+                 max_delay=32.0, open_sheet=None):
+        """
+        Initializes the scheduler.
+
+        Args:
+            sheet: The worksheet to wrap, or None to open it with
+            'open_sheet' on first use.
+            requests_per_minute (int): Requests allowed per minute.
+            burst (int): Most requests sent at once without waiting.
+            retries (int): Most retries of one request.
+            base_delay (float): Seconds before the first retry.
+            max_delay (float): Most seconds before one retry.
+            open_sheet (callable): Opens the worksheet when 'sheet' is
+            None.
+        """
+        self.sheet = sheet
+        self.open_sheet = open_sheet
+        self.open_failed = False
+        self.open_lock = threading.Lock()
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.random = random.Random()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        """
+        Returns the attribute of the worksheet, scheduling methods.
+
+        Args:
+            name (str): The attribute name.
+
+        Returns:
+            The attribute, rate limited and retried if it is callable.
+
+        Raises:
+            Exception: The error of opening the worksheet.
+        """
+        if name.startswith("__"):
+            raise AttributeError(name)
+        attribute = getattr(self.opened(), name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def request(*args, **kwargs):
+            if name in self.READ_METHODS:
+                return self.coalesce(name, attribute, args, kwargs)
+            return self.send(name, attribute, args, kwargs)
+        return request
+
+    def opened(self):
+        """
+        Returns the worksheet, opening it first if needed.
+
+        Returns:
+            The worksheet.
+
+        Raises:
+            Exception: The error of the last attempt to open it.
+        """
+        if self.sheet is not None:
+            return self.sheet
+        with self.open_lock:
+            if self.sheet is None:
+                retries = 0 if self.open_failed else self.retries
+                try:
+                    self.sheet = self.send("open_sheet", self.open_sheet,
+                                           (), {}, retries)
+                except Exception:
+                    self.open_failed = True
+                    raise
+            return self.sheet
+
+    def coalesce(self, name, method, args, kwargs):
+        """
+        Sends a read, or waits for the same read already being sent.
+
+        Args:
+            name (str): The method name.
+            method (callable): The worksheet method.
+            args (tuple): Positional arguments of the call.
+            kwargs (dict): Keyword arguments of the call.
+
+        Returns:
+            The result of the read.
+        """
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return self.send(name, method, args, kwargs)
+        with self.lock:
+            call = self.in_flight.get(key)
+            if call is None:
+                call = self.in_flight[key] = {"done": threading.Event()}
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = self.send(name, method, args, kwargs)
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            call["done"].set()
+
+    def send(self, name, method, args, kwargs, retries=None):
+        """
+        Sends a request within the rate limit, retrying it if it fails
+        for a reason that may go away.
+
+        Args:
+            name (str): The method name.
+            method (callable): The worksheet method.
+            args (tuple): Positional arguments of the call.
+            kwargs (dict): Keyword arguments of the call.
+            retries (int): Most retries, or None for 'retries'.
+
+        Returns:
+            The result of the request.
+
+        Raises:
+            Exception: The error of the last attempt, or of the first
+            one that should not be retried.
+        """
+        if retries is None:
+            retries = self.retries
+        attempt = 0
+        while True:
+            self.bucket.take()
+            try:
+                return method(*args, **kwargs)
+            except Exception as e:
+                if (attempt >= retries
+                        or not self.should_retry(e, name)):
+                    raise
+            if PROFILER.enabled:
+                PROFILER.count("sheets.retries")
+            time.sleep(self.backoff(attempt))
+            attempt += 1
+
+    def should_retry(self, error, name):
+        """
+        Checks whether a failed request is worth sending again.
+
+        Args:
+            error (Exception): The error the request raised.
+            name (str): The method name.
+
+        Returns:
+            bool: True for quota errors, and for server and network
+            errors of requests that do no harm when repeated. A missing
+            file, such as the credentials, is not retried.
+        """
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+        if status == 429:
+            return True
+        if name not in self.IDEMPOTENT_METHODS:
+            return False
+        if status is not None:
+            return status >= 500
+        return (isinstance(error, OSError)
+                and not isinstance(error, FileNotFoundError))
+
+    def backoff(self, attempt):
+        """
+        Returns the seconds to wait before a retry.
+
+        The limit doubles with every attempt up to 'max_delay', and the
+        wait is a random time below it, so processes that failed
+        together do not retry together.
+
+        Args:
+            attempt (int): The number of retries made so far.
+
+        Returns:
+            float: Seconds to wait.
+        """
+        limit = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return self.random.uniform(0, limit)
+
+
+# Class OfflineQueue
+
+
+class OfflineQueue:
+    """
+    Keeps Hall of Fame increments that could not be written in a file,
+    so they are sent later, even by another run of the game.
+
+    Each line of the file holds one [name, won, lost] increment.
+
+    Attributes:
+        path (str): The queue file.
+    """
+
+    def __init__(self, path):
+        """
+        Initializes the queue.
+
+        Args:
+            path (str): The queue file.
+        """
+        self.path = path
+
+    def __bool__(self):
+        """
+        Returns True if the queue file holds increments.
+        """
+        return os.path.exists(self.path)
+
+    def save(self, increments):
+        """
+        Adds increments to the queue file.
+
+        Args:
+            increments (dict): Maps normalized player names to [name,
+            won, lost] increments.
+
+        Raises:
+            OSError: If the file cannot be written.
+        """
+        if not increments:
+            return
+        lines = "".join(json.dumps(increment) + "\n"
+                        for increment in increments.values())
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(lines)
+
+    def claim(self):
+        """
+        Takes every increment out of the queue file.
+
+        The file is renamed before it is read, so two processes never
+        claim the same increments.
+
+        Returns:
+            dict: Maps normalized player names to [name, won, lost]
+            increments, empty if the queue is empty.
+        """
+        claimed = f"{self.path}.{os.getpid()}"
+        try:
+            os.replace(self.path, claimed)
+        except FileNotFoundError:
+            return {}
+        try:
+            return self.read(claimed)
+        finally:
+            os.remove(claimed)
+
+    def peek(self):
+        """
+        Returns the increments in the queue file without taking them.
+
+        Returns:
+            dict: Maps normalized player names to [name, won, lost]
+            increments, empty if the queue is empty or cannot be read.
+        """
+        try:
+            return self.read(self.path)
+        except OSError:
+            return {}
+
+    @staticmethod
+    def read(path):
+        """
+        Reads and adds up the increments in a queue file, skipping lines
+        that cannot be parsed.
+
+        Args:
+            path (str): The file to read.
+
+        Returns:
+            dict: Maps normalized player names to [name, won, lost]
+            increments.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        increments = {}
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    name, won, lost = json.loads(line)
+                    won, lost = int(won), int(lost)
+                except (ValueError, TypeError):
+                    continue
+                record = increments.setdefault(normalize_name(name),
+                                               [name, 0, 0])
+                record[1] += won
+                record[2] += lost
+        return increments
+
+
+# Player names
+
+
+def normalize_name(player_name):
+    """
+    Returns the form of a player name used to look players up, so names
+    that differ only in case or surrounding spaces are the same player.
+
+    Args:
+        player_name (str): The name.
+
+    Returns:
+        str: The name without surrounding spaces, in lower case.
+    """
+    return player_name.strip().lower()
+
+
+# Class HallOfFameCache
+
+
+class HallOfFameCache(PlayerStore):
+    """
+    Keeps a local copy of the Hall of Fame sheet and writes changes back
+    in batches. This is the Google Sheets 'PlayerStore'.
+
+    The sheet is downloaded once, on first use. Lookups are then served
+    from a dictionary keyed by the normalized player name (see
+    'normalize_name'), which is also the record key. New players, wins
+    and losses are queued as per-player increments, which add up until
+    'flush' writes them.
+
+    The sheet is a ledger: a player's record is the sum of all rows
+    with the player's name, and 'flush' only ever appends one row of
+    increments per player. No row is read back or overwritten, so
+    caches in different processes flushing at the same time cannot undo
+    each other's updates. The sheet grows by one row per player and
+    flush; merging a player's rows by hand keeps the same record.
+
+    With an 'OfflineQueue', increments that cannot be written are saved
+    to its file and sent by the next flush, and the cache still works
+    if the sheet cannot be read at all: players are then looked up
+    among the ones of this run only, until a flush succeeds.
+
+    Attributes:
+        sheet: The worksheet, a gspread 'Worksheet' or an object with
+        the same methods, such as the tests' 'FakeSheet'.
+        queue (OfflineQueue): Keeps increments that could not be
+        written, or None to keep them in memory only.
+        offline (bool): True while the sheet could not be read.
+        players (dict): Maps normalized player names to [name, won,
+        lost] lists, including increments that are still pending.
+        pending (dict): Maps normalized player names to the [name, won,
+        lost] increments not written to the sheet yet.
+        ranking (RankingIndex): The players sorted for the leaderboard,
+        updated along with every change.
+    """
+
+    def __init__(self, sheet, queue=None):
+        """
+        Initializes the cache without contacting the sheet.
+
+        Args:
+            sheet: The worksheet to cache.
+            queue (OfflineQueue): Keeps increments that could not be
+            written, or None to keep them in memory only.
+        """
+        self.sheet = sheet
+        self.queue = queue
+        self.offline = False
+        self.players = None
+        self.pending = {}
+        self.ranking = RankingIndex()
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()
+        self.writer = None
+        self.flush_requested = False
+
+    @staticmethod
+    def read_sheet(values):
+        """
+        Parses the values of the sheet.
+
+        Args:
+            values (list of lists): The rows of the sheet, starting with
+            the header row.
+
+        Returns:
+            dict: Maps normalized player names to [name, won, lost]
+            lists in the order of their first rows, with the counts of
+            all their rows added up and the name as in the first row.
+        """
+        players = {}
+        for row in values[1:]:
+            if not row or not row[0]:
+                continue
+            record = players.setdefault(normalize_name(row[0]),
+                                        [row[0], 0, 0])
+            record[1] += int(row[1] or 0)
+            record[2] += int(row[2] or 0)
+        return players
+
+    def load(self):
+        """
+        Downloads the sheet if that has not happened yet, and starts
+        sending the offline queue if it holds increments.
+
+        Raises:
+            Exception: If the sheet cannot be read and there is no
+            offline queue.
+        """
+        with self.lock:
+            if self.players is not None:
+                return
+            try:
+                values = self.sheet.get_all_values()
+                self.offline = False
+            except Exception:
+                if self.queue is None:
+                    raise
+                values = []
+                self.offline = True
+            players = self.read_sheet(values)
+            self._add_pending(players)
+            self.players = players
+            self.ranking.rebuild(self.players)
+            if self.queue and not self.offline:
+                self.flush_in_background()
+
+    def reload(self):
+        """
+        Writes pending changes and downloads the sheet again.
+
+        If the changes cannot be written they stay pending or in the
+        offline queue and are counted in the downloaded records, so
+        nothing is lost. The sheet is not read while a flush is writing,
+        since its rows could then be counted twice or not at all.
+        """
+        try:
+            self.flush()
+        finally:
+            with self.flush_lock, self.lock:
+                self.players = None
+                self.load()
+
+    def find(self, player_name):
+        """
+        Looks up a player by name, ignoring case.
+
+        Args:
+            player_name (str): The name to look up.
+
+        Returns:
+            tuple: The normalized name, which is the record key, and a
+            [name, won, lost] list, or None if the player is not in the
+            sheet. While offline every player is found, with the games
+            of this run only.
+        """
+        self.load()
+        key = normalize_name(player_name)
+        with self.lock:
+            record = self.players.get(key)
+            if record is None:
+                if not self.offline:
+                    return None
+                record = self.players[key] = [player_name, 0, 0]
+                self.ranking.update(key, player_name, 0, 0)
+            return key, list(record)
+
+    def add(self, player_name):
+        """
+        Adds a player with no games.
+
+        Args:
+            player_name (str): The name of the new player.
+
+        Returns:
+            str: The normalized name, which is the record key.
+        """
+        self.load()
+        key = normalize_name(player_name)
+        with self.lock:
+            if key not in self.players:
+                self.players[key] = [player_name, 0, 0]
+                self.ranking.update(key, player_name, 0, 0)
+            self.pending.setdefault(key, [player_name, 0, 0])
+            return key
+
+    def increment(self, key, won):
+        """
+        Adds one win or one loss to a player and queues it for 'flush'.
+
+        Args:
+            key (str): The normalized name of the player.
+            won (bool): True to count a win, False to count a loss.
+        """
+        self.load()
+        column = 1 if won else 2
+        with self.lock:
+            record = self.players[key]
+            record[column] += 1
+            self.ranking.update(key, *record)
+            self.pending.setdefault(key, [record[0], 0, 0])[column] += 1
+
+    def records(self):
+        """
+        Returns every player in sheet order, including unflushed changes.
+
+        Returns:
+            list: One dictionary per player with the same keys as the
+            sheet header.
+        """
+        self.load()
+        with self.lock:
+            return [
+                {"player_name": name, "games_won": won, "games_lost": lost}
+                for name, won, lost in self.players.values()
+            ]
+
+    def top(self, count=10):
+        """
+        Returns the players with the most wins.
+
+        Args:
+            count (int): Maximum number of players to return.
+
+        Returns:
+            list: Player dictionaries, most wins first.
+        """
+        return [
+            {key: player[key]
+             for key in ("player_name", "games_won", "games_lost")}
+            for player in self.leaderboard(page_size=count)["players"]
+        ]
+
+    def leaderboard(self, order="wins", page=0, page_size=10, search=""):
+        """
+        Returns one page of the players ranked by 'order' from the local
+        ranking index, without contacting the sheet once it is loaded.
+
+        Args:
+            order (str): "wins", "win_rate" or "games".
+            page (int): The page number, starting at 0.
+            page_size (int): Players per page.
+            search (str): Text the listed names must contain.
+
+        Returns:
+            dict: The page, as described in 'PlayerStore.leaderboard'.
+        """
+        self.load()
+        with self.lock:
+            return self.ranking.page(order, page, page_size, search)
+
+    def flush(self):
+        """
+        Writes all pending increments to the sheet.
+
+        The increments are appended as new rows, one per player, in one
+        request that inserts rows rather than filling existing ones. If
+        it fails, the increments are saved to the offline queue, or
+        queued in memory again, for the next flush, which also sends the
+        increments saved by earlier runs. After sending those, or after
+        the sheet could not be read, the sheet is downloaded again so
+        the local records include them.
+
+        Returns:
+            int: Number of rows written.
+        """
+        with self.flush_lock:
+            replayed = self.queue.claim() if self.queue is not None else {}
+            with self.lock:
+                self._requeue(replayed)
+                if not self.pending:
+                    return 0
+                queued, self.pending = self.pending, {}
+
+            try:
+                self.sheet.append_rows(list(queued.values()),
+                                       insert_data_option="INSERT_ROWS")
+            except Exception:
+                self._save_offline(queued)
+                raise
+
+            with self.lock:
+                if self.offline or replayed:
+                    self.offline = False
+                    self.players = None
+                    self.load()
+            return len(queued)
+
+    def flush_in_background(self):
+        """
+        Makes sure a background thread flushes the pending increments.
+
+        Only one writer thread runs at a time. A request made while it
+        is writing makes it flush once more before it stops, so
+        increments queued in the meantime are not left behind.
+
+        Returns:
+            threading.Thread: The writer thread.
+        """
+        with self.lock:
+            self.flush_requested = True
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write_pending,
+                                               daemon=True)
+                self.writer.start()
+            return self.writer
+
+    def _write_pending(self):
+        """
+        Flushes until no more flushes have been requested.
+        """
+        while True:
+            with self.lock:
+                if not self.flush_requested:
+                    self.writer = None
+                    return
+                self.flush_requested = False
+            self._flush_quietly()
+
+    def _add_pending(self, players):
+        """
+        Adds the pending increments, and the ones waiting in the offline
+        queue, to records read from the sheet.
+
+        Args:
+            players (dict): Records as returned by 'read_sheet'.
+        """
+        queued = self.queue.peek() if self.queue is not None else {}
+        for increments in (self.pending, queued):
+            for key, (name, won, lost) in increments.items():
+                record = players.setdefault(key, [name, 0, 0])
+                record[1] += won
+                record[2] += lost
+
+    def flush_and_report(self):
+        """
+        Runs 'flush' and prints a message if it fails, saying whether
+        the changes were kept in the offline queue.
+        """
+        try:
+            self.flush()
+        except Exception as e:
+            with self.lock:
+                saved = self.queue is not None and not self.pending
+            if saved:
+                print(Fore.YELLOW + f"The Hall of Fame is not reachable: {e}"
+                      "\nYour results are kept and will be saved next time."
+                      + Style.RESET_ALL)
+            else:
+                print(Fore.RED + f"Could not save the Hall of Fame: {e}" +
+                      Style.RESET_ALL)
+
+    def _save_offline(self, queued):
+        """
+        Saves increments after a failed flush to the offline queue, or
+        queues them in memory again if that is not possible.
+
+        Args:
+            queued (dict): Increments that were not written, as in
+            'pending'.
+        """
+        if self.queue is not None:
+            try:
+                self.queue.save(queued)
+                return
+            except OSError:
+                pass
+        with self.lock:
+            self._requeue(queued)
+
+    def _requeue(self, queued):
+        """
+        Queues increments again after a failed flush.
+
+        Args:
+            queued (dict): Increments that were not written, as in
+            'pending'.
+        """
+        for key, (name, won, lost) in queued.items():
+            record = self.pending.setdefault(key, [name, 0, 0])
+            record[1] += won
+            record[2] += lost
+
+
+# Class SQLitePlayerStore
+
+
+class SQLitePlayerStore(PlayerStore):
+    """
+    Stores player records in a local SQLite database.
+
+    Names are looked up through a unique index on their normalized form
+    and results are counted with a single atomic 'UPDATE', so records
+    stay correct even when several games share the database.
+
+    Attributes:
+        path (str): Path of the database file.
+    """
+
+    def __init__(self, path=SQLITE_FILE):
+        """
+        Opens the database and creates the players table if needed.
+
+        Args:
+            path (str): Path of the database file, or ':memory:'.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS players ("
+                " id INTEGER PRIMARY KEY,"
+                " player_name TEXT NOT NULL,"
+                " name_key TEXT NOT NULL UNIQUE,"
+                " games_won INTEGER NOT NULL DEFAULT 0,"
+                " games_lost INTEGER NOT NULL DEFAULT 0)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS players_by_wins"
+                " ON players (games_won DESC, games_lost)")
+
+    def find(self, player_name):
+        """
+        Looks up a player by name, ignoring case.
+
+        Args:
+            player_name (str): The name to look up.
+
+        Returns:
+            tuple: The player id and a [name, won, lost] list, or None if
+            the player is not in the database.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT id, player_name, games_won, games_lost"
+                " FROM players WHERE name_key = ?",
+                (normalize_name(player_name),)).fetchone()
+        if row is None:
+            return None
+        return row[0], list(row[1:])
+
+    def add(self, player_name):
+        """
+        Adds a player with no games and returns their id.
+
+        Args:
+            player_name (str): The name of the new player.
+
+        Returns:
+            int: The id of the new player.
+        """
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO players (player_name, name_key) VALUES (?, ?)",
+                (player_name, normalize_name(player_name)))
+        return cursor.lastrowid
+
+    def increment(self, player_id, won):
+        """
+        Adds one win or one loss to a player.
+
+        Args:
+            player_id (int): The id of the player.
+            won (bool): True to count a win, False to count a loss.
+        """
+        column = "games_won" if won else "games_lost"
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"UPDATE players SET {column} = {column} + 1 WHERE id = ?",
+                (player_id,))
+
+    def records(self):
+        """
+        Returns every player in the order they were added.
+
+        Returns:
+            list: One dictionary per player.
+        """
+        return self._query("ORDER BY id")
+
+    def top(self, count=10):
+        """
+        Returns the players with the most wins.
+
+        Args:
+            count (int): Maximum number of players to return.
+
+        Returns:
+            list: Player dictionaries, most wins first.
+        """
+        return self._query("ORDER BY games_won DESC, games_lost LIMIT ?",
+                           (count,))
+
+    ORDER_BY = {
+        "wins": "games_won DESC, games_lost, name_key",
+        "win_rate": "CASE WHEN games_won + games_lost > 0"
+                    " THEN CAST(games_won AS REAL)"
+                    " / (games_won + games_lost) ELSE 0 END DESC,"
+                    " games_won + games_lost DESC, name_key",
+        "games": "games_won + games_lost DESC, games_won DESC, name_key",
+    }
+
+    def leaderboard(self, order="wins", page=0, page_size=10, search=""):
+        """
+        Returns one page of the players ranked by 'order'.
+
+        Ranks are numbered over all players before the search filter is
+        applied, so found players keep their overall rank.
+
+        Args:
+            order (str): "wins", "win_rate" or "games".
+            page (int): The page number, starting at 0.
+            page_size (int): Players per page.
+            search (str): Text the listed names must contain.
+
+        Returns:
+            dict: The page, as described in 'PlayerStore.leaderboard'.
+        """
+        ranked = (f"SELECT ROW_NUMBER() OVER (ORDER BY {self.ORDER_BY[order]})"
+                  " AS rank, player_name, name_key, games_won, games_lost"
+                  " FROM players")
+        where = " WHERE instr(name_key, ?) > 0"
+        needle = search.lower()
+        with self.lock:
+            total = self.connection.execute(
+                f"SELECT COUNT(*) FROM players{where}",
+                (needle,)).fetchone()[0]
+            pages = max(1, -(-total // page_size))
+            page = min(max(page, 0), pages - 1)
+            rows = self.connection.execute(
+                f"SELECT rank, player_name, games_won, games_lost"
+                f" FROM ({ranked}){where} ORDER BY rank LIMIT ? OFFSET ?",
+                (needle, page_size, page * page_size)).fetchall()
+        return leaderboard_page(rows, order, page, pages, total)
+
+    def _query(self, clause, parameters=()):
+        """
+        Selects players as dictionaries.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT player_name, games_won, games_lost FROM players "
+                + clause, parameters).fetchall()
+        return [
+            {"player_name": name, "games_won": won, "games_lost": lost}
+            for name, won, lost in rows
+        ]
+
+
+# Open player storage
+
+
+def open_hof_sheet():
+    """
+    Connects to Google Sheets and opens the Hall of Fame worksheet.
+
+    The Google libraries are imported here rather than at the top of the
+    file because importing them takes longer than the rest of startup.
+
+    Returns:
+        gspread.Worksheet: The "hof" worksheet of the "connect_four"
+        spreadsheet.
+    """
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    creds = Credentials.from_service_account_file("creds.json")
+    scoped_creds = creds.with_scopes(SCOPE)
+    gspread_client = gspread.authorize(scoped_creds)
+    sheet = gspread_client.open("connect_four")
+    return sheet.worksheet("hof")
+
+
+def profile_sheet(sheet):
+    """
+    Wraps a worksheet in 'ProfiledSheet' while profiling.
+
+    Args:
+        sheet: The worksheet.
+
+    Returns:
+        The worksheet, wrapped if profiling is enabled.
+    """
+    return ProfiledSheet(sheet) if PROFILER.enabled else sheet
+
+
+@profiled("storage.open")
+def create_player_store(storage=STORAGE):
+    """
+    Creates the player storage selected by 'CONNECT_FOUR_STORAGE'.
+
+    Args:
+        storage (str): "sheets" for the Google Sheets Hall of Fame,
+        "sqlite" or "sqlite:<path>" for a local database, or "memory"
+        for an in-memory database that is lost when the program ends. The
+        Google Sheets worksheet is opened on first use, and while it
+        cannot be opened the Hall of Fame works offline.
+
+    Returns:
+        PlayerStore: The player storage.
 
-        Returns:
-            None
-        """
-        clear_screen()
-        print(" 1 2 3 4 5 6 7")
-        print("---------------")
-        for row in self.grid:
-            print("|" + "|".join(row) + "|")
-        print("---------------\n")
-        pass
+    Raises:
+        ValueError: If the storage name is unknown.
+    """
+    if storage == "sheets":
+        return HallOfFameCache(
+            SheetScheduler(open_sheet=lambda: profile_sheet(open_hof_sheet())),
+            OfflineQueue(HOF_QUEUE_FILE))
+    if storage == "memory":
+        return SQLitePlayerStore(":memory:")
+    if storage == "sqlite" or storage.startswith("sqlite:"):
+        return SQLitePlayerStore(storage.partition(":")[2] or SQLITE_FILE)
+    raise ValueError(f"Unknown storage '{storage}'")
 
-    def check_win(self, piece):
-        """
-        Checks if the current board has a winning condition for the
-        specified piece.
 
-        Args:
-            piece (str): The symbol representing the player's piece
-            to check for a win.
+_player_store = None
+_player_store_lock = threading.Lock()
 
-        Returns:
-            bool: True if there is a sequence of four same pieces in a row,
-            column, or diagonal; False otherwise.
-        """
-        for row in range(6):
-            for col in range(4):
-                if (
-                    self.grid[row][col] == piece
-                    and self.grid[row][col + 1] == piece
-                    and self.grid[row][col + 2] == piece
-                    and self.grid[row][col + 3] == piece
-                ):
-                    return True
-
-        for row in range(3):
-            for col in range(7):
-                if (
-                    self.grid[row][col] == piece
-                    and self.grid[row + 1][col] == piece
-                    and self.grid[row + 2][col] == piece
-                    and self.grid[row + 3][col] == piece
-                ):
-                    return True
-
-        for row in range(3):
-            for col in range(4):
-                if (
-                    self.grid[row][col] == piece
-                    and self.grid[row + 1][col + 1] == piece
-                    and self.grid[row + 2][col + 2] == piece
-                    and self.grid[row + 3][col + 3] == piece
-                ):
-                    return True
-
-        for row in range(3):
-            for col in range(3, 7):
-                if (
-                    self.grid[row][col] == piece
-                    and self.grid[row + 1][col - 1] == piece
-                    and self.grid[row + 2][col - 2] == piece
-                    and self.grid[row + 3][col - 3] == piece
-                ):
-                    return True
 
-        return False
-        pass
+def get_player_store():
+    """
+    Returns the player storage, creating it on first use.
+
+    Returns:
+        PlayerStore: The storage selected by 'CONNECT_FOUR_STORAGE'.
+    """
+    global _player_store
+    with _player_store_lock:
+        if _player_store is None:
+            _player_store = create_player_store()
+        return _player_store
 
 
-# Class Player
+def open_player_store():
+    """
+    Returns the player storage, or None if it cannot be created, for
+    example because 'creds.json' is missing.
 
+    The error is shown in red, like the other storage errors, so the
+    game goes on without the Hall of Fame instead of stopping.
 
-class Player:
+    Returns:
+        PlayerStore: The storage, or None.
     """
-    Represents a player in the Connect Four game.
+    try:
+        return get_player_store()
+    except Exception as e:
+        print(Fore.RED + f"An error occurred: {e}" + Style.RESET_ALL)
+        return None
 
-    Attributes:
-        name (str): The name of the player.
-        games_won (int): The number of games won by the player.
-        games_lost (int): The number of games lost by the player.
+
+def warm_up_player_store(reload=False):
     """
+    Connects to the player storage on a background thread.
 
-    def __init__(self, name):
-        """
-        Initializes a new Player instance.
+    Called while the main menu is shown, so that credentials, the
+    spreadsheet and the Hall of Fame rows are usually ready by the time
+    the first player name has been entered.
 
-        Args:
-            name (str): The name of the player.
-        """
-        self.name = name
-        self.games_won = 0
-        self.games_lost = 0
+    Args:
+        reload (bool): True to download the records again if they were
+        already loaded.
 
-    def record_win(self):
-        """
-        Records a win for the player by incrementing their win count.
-        """
-        self.games_won += 1
+    Returns:
+        threading.Thread: The started thread.
+    """
+    thread = threading.Thread(target=_warm_up_quietly, args=(reload,),
+                              daemon=True)
+    thread.start()
+    return thread
 
-    def record_loss(self):
-        """
-        Records a loss for the player by incrementing their loss count.
-        """
-        self.games_lost += 1
 
-    def greet(self):
-        """
-        Greets the player with a welcome message including their current
-        game statistics.
+def _warm_up_quietly(reload=False):
+    """
+    Opens and loads the player storage, leaving errors to the first
+    real use of the storage.
 
-        Displays a customized greeting based on the player's game history,
-        showing the number of games won and lost.
-        """
-        if self.games_won > 0 or self.games_lost > 0:
-            print(Fore.CYAN + f"Welcome back, {self.name}!")
-            print(Fore.GREEN + f"Won Games: {self.games_won}")
-            print(Fore.RED + f"Lost Games: {self.games_lost}\n")
+    Args:
+        reload (bool): True to download the records again if they were
+        already loaded.
+    """
+    try:
+        store = get_player_store()
+        if reload:
+            store.reload()
         else:
-            print(Fore.CYAN + f"Welcome, {self.name}! "
-                              "Good luck on your first game!\n")
-        print(Style.RESET_ALL)
+            store.load()
+    except Exception:
+        pass
+
+
+def flush_player_store():
+    """
+    Saves pending player records, if the storage was ever opened, and
+    reports errors. Runs after every game, before the player is asked
+    to play again, since a web session can be killed at any prompt, and
+    when the program ends.
+    """
+    if _player_store is not None:
+        _player_store.flush_and_report()
+
+
+atexit.register(flush_player_store)
 
 
 # Game instructions
 
 
+NUMBER_WORDS = (
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight",
+    "nine", "ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen",
+    "sixteen", "seventeen", "eighteen", "nineteen", "twenty",
+)
+
+
 def show_game_instructions():
     """
     Displays the instructions for playing Connect Four.
 
-    Clears the screen and shows a detailed explanation of the game rules.
+    Clears the screen and shows a detailed explanation of the game rules
+    for the board size and number of discs in a row that are set, see
+    '--rows', '--cols' and '--connect'.
     """
     clear_screen()
     print(
         Fore.YELLOW
-        + pyfiglet.figlet_format("Game Instructions", font="bulbhead")
+        + figlet_text("Game Instructions")
         + Style.RESET_ALL
     )
     print("-" * 67)
     game_description = f"""
     Connect Four is a two-player connection game where players
-    take turns dropping discs from the top into a seven-column,
-    six-row vertically suspended grid.
+    take turns dropping discs from the top into a {
+        NUMBER_WORDS[BOARD_COLS]}-column,
+    {NUMBER_WORDS[BOARD_ROWS]}-row vertically suspended grid.
 
     In the two-player mode, one player is represented by the
     symbol {
@@ -881,7 +5200,8 @@ def show_game_instructions():
     Each player alternates turns, dropping one of their discs
     into the grid each turn.
 
-    The goal of the game is to connect four discs vertically,
+    The goal of the game is to connect {
+        NUMBER_WORDS[CONNECT]} discs vertically,
     horizontally, or diagonally before your opponent.
     """
     print(game_description)
@@ -894,51 +5214,772 @@ def show_game_instructions():
 # Hall of Fame
 
 
-def show_hall_of_fame():
+def show_hall_of_fame(page_size=10):
     """
-    Displays the Hall of Fame, listing players and their win-loss records.
+    Displays the Hall of Fame leaderboard, listing players and their
+    win-loss records by rank.
 
-    Clears the screen and presents player statistics in a tabular format.
-    """
-    clear_screen()
-    print(
-        Fore.YELLOW
-        + pyfiglet.figlet_format("Hall of Fame", font="bulbhead")
-        + Style.RESET_ALL
-    )
-    print(f"{'Player':<20} {'Wins':<10} {'Losses':<10}")
-    print("-" * 40)
+    Clears the screen and presents one page of player statistics in a
+    tabular format. The player can page through the list, change the
+    ranking between wins, win rate and games played, and search for a
+    name.
 
-    player_data = HOF_SHEET.get_all_records()
-    for player in player_data:
+    Args:
+        page_size (int): Players shown per page.
+    """
+    orders = list(RankingIndex.ORDERS)
+    order = orders[0]
+    page = 0
+    search = ""
+    store = open_player_store()
+    if store is None:
+        input(Fore.BLUE + "\nPress Enter to return to Main Menu!\n"
+              + Style.RESET_ALL)
+        return
+    while True:
+        board = store.leaderboard(order, page, page_size, search)
+        page = board["page"]
+        clear_screen()
         print(
-            f"{player['player_name']:<20} "
-            f"{player['games_won']:<10} "
-            f"{player['games_lost']:<10}"
+            Fore.YELLOW
+            + figlet_text("Hall of Fame")
+            + Style.RESET_ALL
         )
-    print("-" * 40)
-
-    input(Fore.BLUE + "\nPress Enter to return to Main Menu!\n")
+        heading = f"Ranked by {RankingIndex.ORDERS[order].lower()}"
+        if search:
+            heading += f", names containing '{search}'"
+        print(heading + "\n")
+        print(f"{'Rank':<6}{'Player':<21}{'Wins':<7}{'Losses':<8}"
+              f"{'Games':<7}{'Win %':<6}")
+        print("-" * 55)
+        for player in board["players"]:
+            games = player["games_won"] + player["games_lost"]
+            rate = 100 * player["games_won"] / games if games else 0
+            print(
+                f"{player['rank']:<6}"
+                f"{player['player_name']:<21}"
+                f"{player['games_won']:<7}"
+                f"{player['games_lost']:<8}"
+                f"{games:<7}"
+                f"{rate:>5.1f}"
+            )
+        print("-" * 55)
+        print(f"Page {page + 1} of {board['pages']} "
+              f"({board['total']} players)")
+
+        choice = input(
+            Fore.BLUE + "\n(N)ext, (P)revious, (S)ort, (F)ind, "
+            "or press Enter to return to Main Menu!\n"
+            + Style.RESET_ALL).strip().lower()
+        if choice == "n":
+            page += 1
+        elif choice == "p":
+            page -= 1
+        elif choice == "s":
+            order = orders[(orders.index(order) + 1) % len(orders)]
+            page = 0
+        elif choice == "f":
+            search = input("Name to find (empty for all players):\n").strip()
+            page = 0
+        elif choice == "":
+            break
     print(Style.RESET_ALL)
 
 
-# Main program execution
+# Network server
 
-if __name__ == "__main__":
+SERVER_PORT = 4000
+
+
+def _server_worker_init():
     """
-    Entry point for the Connect Four game.
+    Prepares a process of the server's AI pool.
 
-    When the script is run directly (not imported as a module in
-    another script), this block is executed. It calls the main_menu
-    function to start the game, initiating the game loop.
+    The pool already uses every CPU, so the Monte Carlo level searches
+    in a single process here instead of starting a pool of its own.
+    """
+    DIFFICULTY_LEVELS["mcts"]["processes"] = 1
+
+
+def _server_computer_move(data, player_piece, difficulty):
+    """
+    Chooses the computer's move inside a process of the AI pool.
+
+    Args:
+        data (bytes): The board, packed by 'Board.to_bytes'.
+        player_piece (int): The piece code of the computer.
+        difficulty (str): Key into 'DIFFICULTY_LEVELS'.
+
+    Returns:
+        int: The chosen column index.
+    """
+    return get_computer_move(Board.from_bytes(data), player_piece,
+                             difficulty)
+
+
+class ServerClient:
+    """
+    A player connected to the game server.
+
+    Attributes:
+        reader (asyncio.StreamReader): Lines typed by the player.
+        writer (asyncio.StreamWriter): Text shown to the player.
+        name (str): The player's name once it has been entered.
+        connected (bool): False once the connection has been lost.
+    """
+
+    def __init__(self, reader, writer):
+        """
+        Initializes a client for a new connection.
+
+        Args:
+            reader (asyncio.StreamReader): The connection's reader.
+            writer (asyncio.StreamWriter): The connection's writer.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.name = None
+        self.connected = True
+
+    async def send(self, text):
+        """
+        Shows text to the player. Errors mark the client as disconnected
+        instead of being raised, so a lost opponent never breaks the
+        other player's game.
+
+        Args:
+            text (str): The text, with newline line breaks.
+        """
+        if not self.connected:
+            return
+        try:
+            self.writer.write(text.replace("\n", "\r\n").encode())
+            await self.writer.drain()
+        except (ConnectionError, OSError):
+            self.connected = False
+
+    async def ask(self, prompt):
+        """
+        Shows a prompt and waits for the player's answer.
+
+        Args:
+            prompt (str): The prompt.
+
+        Returns:
+            str: The answer without surrounding whitespace.
+
+        Raises:
+            ConnectionError: If the player has disconnected.
+        """
+        await self.send(prompt)
+        if self.connected:
+            try:
+                line = await self.reader.readline()
+            except (ConnectionError, OSError):
+                line = b""
+            if line:
+                return line.decode("utf-8", "replace").strip()
+        self.connected = False
+        raise ConnectionError("Client disconnected")
+
+    def check_connected(self):
+        """
+        Finds out whether a player who is not being asked anything, such
+        as one waiting for an opponent, has disconnected.
+
+        Returns:
+            bool: The updated 'connected'.
+        """
+        if (self.reader.at_eof() or self.reader.exception() is not None
+                or self.writer.is_closing()):
+            self.connected = False
+        return self.connected
+
+    async def close(self):
+        """
+        Closes the connection.
+        """
+        self.connected = False
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+class GameServer:
+    """
+    Hosts many games over TCP in one process with asyncio.
+
+    Each connection is a 'ServerClient' driven by its own task, and
+    players can play the computer or be paired with the next player
+    waiting for an opponent. Games reuse 'Board' and the rules of
+    'start_game'. Computer moves run in a process pool, so a long search
+    never holds up the other games.
+
+    Attributes:
+        host (str): The address to listen on.
+        port (int): The TCP port to listen on.
+        workers (int): Processes in the AI pool, None for all CPUs.
+        waiting (tuple): The client waiting for an opponent and the
+        future that is resolved when their game is over, or None.
+        games (int): Number of games being played.
+    """
+
+    def __init__(self, host="0.0.0.0", port=SERVER_PORT, workers=None):
+        """
+        Initializes the server without listening yet.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The TCP port to listen on.
+            workers (int): Processes in the AI pool, None for all CPUs.
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.waiting = None
+        self.games = 0
+        self.loop = None
+        self.pool = None
+
+    async def serve(self):
+        """
+        Listens for players until the task is cancelled.
+
+        'asyncio' and 'concurrent.futures' are imported here because
+        only the server needs them and importing them slows down
+        startup.
+        """
+        import asyncio
+        import concurrent.futures
+
+        self.loop = asyncio.get_running_loop()
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            self.workers, initializer=_server_worker_init)
+        # Start the workers before listening, so they do not inherit the
+        # socket and the first computer move does not wait for them.
+        await self.loop.run_in_executor(self.pool, int)
+        server = await asyncio.start_server(self.handle_client, self.host,
+                                            self.port)
+        if hasattr(signal, "SIGTERM") and os.name != "nt":
+            self.loop.add_signal_handler(signal.SIGTERM,
+                                         asyncio.current_task().cancel)
+        try:
+            async with server:
+                print(f"Connect Four server listening on "
+                      f"{self.host}:{self.port}")
+                await server.serve_forever()
+        finally:
+            # Moves of cancelled games are cancelled with them, so there
+            # is nothing left worth waiting for.
+            self.pool.shutdown(wait=False)
+
+    async def handle_client(self, reader, writer):
+        """
+        Runs the menu of one connected player until they leave.
+
+        Args:
+            reader (asyncio.StreamReader): The connection's reader.
+            writer (asyncio.StreamWriter): The connection's writer.
+        """
+        client = ServerClient(reader, writer)
+        try:
+            await client.send("Welcome to Connect Four!\n")
+            while True:
+                name = await client.ask(
+                    "Enter your name (3-20 characters, letters, numbers, "
+                    "and spaces only; at least one letter required):\n")
+                if is_valid_player_name(name):
+                    client.name = name
+                    break
+                await client.send("Invalid name.\n")
+            while True:
+                choice = (await client.ask(
+                    "\n1. Play against the computer\n"
+                    "2. Play against another player\n"
+                    "3. Exit\nEnter your choice (1-3):\n")).lower()
+                if choice == "1":
+                    difficulty = await self.ask_difficulty(client)
+                    await self.play_match([client, None], difficulty)
+                elif choice == "2":
+                    await self.join_lobby(client)
+                elif choice == "3":
+                    await client.send("ByeBye, thank you for playing!\n")
+                    break
+                else:
+                    await client.send("Invalid choice.\n")
+        except ConnectionError:
+            pass
+        finally:
+            if self.waiting and self.waiting[0] is client:
+                self.waiting[1].set_result(None)
+                self.waiting = None
+            await client.close()
+
+    async def ask_difficulty(self, client):
+        """
+        Asks a player how strong the computer should be.
+
+        Args:
+            client (ServerClient): The player.
+
+        Returns:
+            str: The chosen key of 'DIFFICULTY_LEVELS'.
+        """
+        levels = list(DIFFICULTY_LEVELS)
+        menu = "".join(f"{number}. {DIFFICULTY_LEVELS[level]['name']}\n"
+                       for number, level in enumerate(levels, start=1))
+        while True:
+            answer = await client.ask(
+                f"Choose the computer difficulty:\n{menu}"
+                f"Enter your choice (1-{len(levels)}):\n")
+            if answer.isdigit() and 1 <= int(answer) <= len(levels):
+                return levels[int(answer) - 1]
+            await client.send("Invalid choice.\n")
+
+    async def join_lobby(self, client):
+        """
+        Pairs a player with the one waiting for an opponent, or makes
+        them wait for the next one.
+
+        The waiting player moves first. Their task sleeps on a future
+        while the game runs in the task of the player who joined. A
+        waiting player who has disconnected is dropped, and a player
+        with the same name as the waiting one is turned away, because
+        both would share one Hall of Fame record.
+
+        Args:
+            client (ServerClient): The player.
+        """
+        if self.waiting and not self.waiting[0].check_connected():
+            self.waiting[1].set_result(None)
+            self.waiting = None
+        if self.waiting:
+            opponent, done = self.waiting
+            if normalize_name(opponent.name) == normalize_name(client.name):
+                await client.send(f"{opponent.name} is already waiting. "
+                                  "Two players cannot have the same "
+                                  "name.\n")
+                return
+            self.waiting = None
+            try:
+                await self.play_match([opponent, client])
+            finally:
+                done.set_result(None)
+            return
+        done = self.loop.create_future()
+        self.waiting = (client, done)
+        await client.send("Waiting for an opponent...\n")
+        await done
+
+    async def computer_move(self, board, player_piece, difficulty):
+        """
+        Chooses the computer's move in the AI pool.
+
+        Args:
+            board (Board): The current game board.
+            player_piece (int): The piece code of the computer.
+            difficulty (str): Key into 'DIFFICULTY_LEVELS'.
+
+        Returns:
+            int: The chosen column index.
+        """
+        return await self.loop.run_in_executor(
+            self.pool, _server_computer_move, board.to_bytes(),
+            player_piece, difficulty)
+
+    async def player_move(self, client, board):
+        """
+        Asks a player for a column until they give a valid one.
+
+        Args:
+            client (ServerClient): The player.
+            board (Board): The current game board.
+
+        Returns:
+            int or None: The chosen column index, or None if the player
+            quit or disconnected.
+        """
+        while True:
+            try:
+                answer = await client.ask(
+                    f"{client.name}, choose a column (1-{board.cols}) "
+                    "or 'Q' to quit:\n")
+            except ConnectionError:
+                return None
+            if answer.lower() == "q":
+                return None
+            if answer.isdigit() and board.is_valid_location(int(answer) - 1):
+                return int(answer) - 1
+            await client.send(f"Please choose an open column between 1 "
+                              f"and {board.cols}.\n")
+
+    async def play_match(self, clients, difficulty=None):
+        """
+        Plays one game and stores its result. As in 'start_game', a game
+        a player quits or disconnects from counts for nobody.
+
+        Args:
+            clients (list): The first and second player as
+            'ServerClient' objects, with None for the computer.
+            difficulty (str): Key into 'DIFFICULTY_LEVELS' when playing
+            the computer.
+        """
+        vs_computer = clients[1] is None
+        names = [client.name if client else "Computer" for client in clients]
+        pieces = (PLAYER_PIECE, COMPUTER_PIECE if vs_computer
+                  else OPPONENT_PIECE)
+        board = Board(BOARD_ROWS, BOARD_COLS, CONNECT)
+        started = time.time()
+        self.games += 1
+        turn = 0
+        quitter = None
+        try:
+            while True:
+                frame = BOARD_RENDERER.full_frame(board)
+                for client in clients:
+                    if client:
+                        await client.send(frame)
+                if clients[turn] is None:
+                    col = await self.computer_move(board, pieces[turn],
+                                                   difficulty)
+                else:
+                    other = clients[1 - turn]
+                    if other:
+                        await other.send(f"Waiting for {names[turn]}...\n")
+                    col = await self.player_move(clients[turn], board)
+                    if col is None:
+                        quitter = turn
+                        break
+                row = board.get_next_open_row(col)
+                board.add_piece(row, col, pieces[turn])
+                if board.check_win_at(row, col) or board.is_full():
+                    break
+                turn = 1 - turn
+        finally:
+            self.games -= 1
+
+        record_game(board, names, pieces, started,
+                    difficulty if vs_computer else None,
+                    quit_game=quitter is not None)
+        if quitter is not None:
+            winner = None
+            message = f"{names[quitter]} left the game."
+        elif board.check_win(pieces[turn]):
+            winner = turn
+            message = f"Congratulations, {names[winner]}! You won!"
+        else:
+            winner = None
+            message = "It's a tie!"
+        frame = BOARD_RENDERER.full_frame(board)
+        for client in clients:
+            if client:
+                await client.send(f"{frame}{message}\n")
+        if winner is not None:
+            results = [(names[player], player == winner)
+                       for player in (0, 1) if clients[player]]
+            await self.loop.run_in_executor(None, store_server_results,
+                                            results)
+
+
+def store_server_results(results):
+    """
+    Adds the result of a server game to the players' records.
+
+    Args:
+        results (list): (name, won) pairs of the human players.
+    """
+    store = open_player_store()
+    if store is None:
+        return
+    for name, won in results:
+        record = store.find(name)
+        key = record[0] if record else store.add(name)
+        store.increment(key, won)
+    store.flush_in_background()
+
+
+def run_server(host="0.0.0.0", port=SERVER_PORT, workers=None):
+    """
+    Runs the game server until it is interrupted or terminated. Either
+    way it shuts down cleanly, so the game log and player records are
+    saved at exit.
+
+    Args:
+        host (str): The address to listen on.
+        port (int): The TCP port to listen on.
+        workers (int): Processes in the AI pool, None for all CPUs.
+    """
+    import asyncio
+
+    server = GameServer(host, port, workers)
+    try:
+        asyncio.run(server.serve())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+# Pooled sessions
+
+SESSION_READY = "\x1b]connect-four;ready\x07"
+SESSION_END = "\x1b]connect-four;session-end\x07"
+
+
+def run_pooled_sessions():
     """
+    Serves one player after another in a warm process of the web front
+    end's pool.
+
+    Everything slow is done before the first player connects: the
+    player storage is opened and loaded and the menu titles are
+    rendered. The process then writes 'SESSION_READY' and waits for a
+    line on standard input, which the front end sends when it hands the
+    process to a player. When the player quits, pending records are
+    saved and 'SESSION_END' tells the front end the process can serve
+    the next player. The markers are terminal escape sequences that
+    terminals ignore.
+    """
+    global is_running
+    _warm_up_quietly()
+    figlet_text("Welcome to Connect Four")
+    figlet_text("ByeBye, thank you for playing!")
+    while True:
+        sys.stdout.write(SESSION_READY)
+        sys.stdout.flush()
+        if not sys.stdin.readline():
+            return
+        is_running = True
+        run_game(reload_store=True)
+        flush_player_store()
+        GAME_LOG.flush()
+        sys.stdout.write(SESSION_END)
+        sys.stdout.flush()
+
+
+# Startup time
+
+
+def measure_startup():
+    """
+    Measures how long the program takes to get ready.
+
+    The import is timed in a fresh interpreter, so it is a cold start
+    that includes every library the module loads.
+
+    Returns:
+        dict: Milliseconds for starting a new process and importing this
+        module, for importing it alone, for rendering the first main
+        menu title and for opening the player storage.
+    """
+    folder = os.path.dirname(os.path.abspath(__file__))
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"sys.path.insert(0, {folder!r})\n"
+        "import run\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    start = time.perf_counter()
+    child = subprocess.run([sys.executable, "-c", script],
+                           capture_output=True, text=True, check=True)
+    process_ready = time.perf_counter()
+    figlet_text("Welcome to Connect Four")
+    menu_ready = time.perf_counter()
+    store = open_player_store()
+    if store is not None:
+        store.load()
+    storage_ready = time.perf_counter()
+    return {
+        "process_ms": (process_ready - start) * 1000,
+        "import_ms": float(child.stdout.split()[-1]) * 1000,
+        "menu_ms": (menu_ready - process_ready) * 1000,
+        "storage_ms": (storage_ready - menu_ready) * 1000,
+    }
+
+
+# Command line
+
+
+def set_board_size(rows, cols, connect):
+    """
+    Changes the board used for new games.
+
+    Args:
+        rows (int): Number of rows.
+        cols (int): Number of columns.
+        connect (int): Number of pieces in a row needed to win.
+    """
+    global BOARD_ROWS, BOARD_COLS, CONNECT
+    BOARD_ROWS, BOARD_COLS, CONNECT = rows, cols, connect
+
+
+def main(argv=None):
+    """
+    Parses the command line and starts the requested mode.
+
+    Without arguments the interactive game is started.
+
+    Args:
+        argv (list): Command line arguments, defaults to 'sys.argv'.
+    """
+    parser = argparse.ArgumentParser(description="Connect Four")
+    parser.add_argument(
+        "--build-book", nargs="?", const=OPENING_BOOK_FILE, metavar="FILE",
+        help="build the computer's opening book and exit")
+    parser.add_argument(
+        "--book-plies", type=int, default=8,
+        help="number of moves the opening book covers (default 8)")
+    parser.add_argument(
+        "--book-depth", type=int, default=10,
+        help="search depth per opening book position (default 10)")
+    parser.add_argument(
+        "--self-play", type=int, metavar="GAMES",
+        help="play GAMES headless games between two computer players")
+    parser.add_argument(
+        "--players", nargs=2, default=["easy", "medium"],
+        metavar=("FIRST", "SECOND"),
+        help="players for --self-play: 'random' or a difficulty level")
+    parser.add_argument(
+        "--processes", type=int,
+        help="worker processes for --self-play and --serve "
+             "(default: all CPUs)")
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="base random seed for --self-play (default 0)")
+    parser.add_argument(
+        "--startup-time", action="store_true",
+        help="print how long startup takes and exit")
+    parser.add_argument(
+        "--mcts-rate", action="store_true",
+        help="print the Monte Carlo playouts per second and exit")
+    parser.add_argument(
+        "--rows", type=int, default=BOARD_ROWS,
+        help=f"number of board rows (default {BOARD_ROWS})")
+    parser.add_argument(
+        "--cols", type=int, default=BOARD_COLS,
+        help=f"number of board columns, up to 20 (default {BOARD_COLS})")
+    parser.add_argument(
+        "--connect", type=int, default=CONNECT,
+        help=f"pieces in a row needed to win (default {CONNECT})")
+    parser.add_argument(
+        "--list-games", action="store_true",
+        help="list the recorded games and exit")
+    parser.add_argument(
+        "--replay", type=int, metavar="NUMBER",
+        help="replay a recorded game from --list-games, -1 for the last")
+    parser.add_argument(
+        "--replay-delay", type=float, default=0.5,
+        help="seconds between moves for --replay (default 0.5)")
+    parser.add_argument(
+        "--export-games", metavar="FILE",
+        help="write all recorded games to FILE ('-' for stdout) and exit")
+    parser.add_argument(
+        "--import-games", metavar="FILE",
+        help="add the games in FILE ('-' for stdin) to the log and exit")
+    parser.add_argument(
+        "--profile", nargs="?", const="", metavar="FILE",
+        help="time the game's hot paths, print a report at exit and "
+             "write it to FILE as JSON")
+    parser.add_argument(
+        "--serve", nargs="?", const=str(SERVER_PORT), metavar="[HOST:]PORT",
+        help=f"host games for many players over TCP (default port "
+             f"{SERVER_PORT})")
+    parser.add_argument(
+        "--pooled", action="store_true",
+        help="wait for the web front end to start each session "
+             "(used by its process pool)")
+    args = parser.parse_args(argv)
+    if not (1 <= args.rows <= 20 and 1 <= args.cols <= 20
+            and 2 <= args.connect <= max(args.rows, args.cols)):
+        parser.error("the board needs 1-20 rows and columns and 'connect' "
+                     "must fit on it")
+    set_board_size(args.rows, args.cols, args.connect)
+    if args.profile is not None:
+        PROFILER.enable(args.profile)
+
+    if args.mcts_rate:
+        level = DIFFICULTY_LEVELS["mcts"]
+        for processes in sorted({1, args.processes or os.cpu_count() or 1}):
+            search = MonteCarloSearch(level["playouts"], 0, processes)
+            search.best_move(BitBoard(args.rows, args.cols, args.connect),
+                             0)
+            print(f"{processes} process(es): "
+                  f"{search.playouts_per_second():.0f} playouts/s")
+        return
+
+    if args.serve:
+        host, _, port = args.serve.rpartition(":")
+        if not port.isdigit():
+            parser.error("--serve takes a port or HOST:PORT")
+        run_server(host or "0.0.0.0", int(port), args.processes)
+        return
+
+    if args.startup_time:
+        timings = measure_startup()
+        print(f"Process: {timings['process_ms']:.1f}ms")
+        print(f"Import:  {timings['import_ms']:.1f}ms")
+        print(f"Menu:    {timings['menu_ms']:.1f}ms")
+        print(f"Storage: {timings['storage_ms']:.1f}ms")
+        return
+
+    if args.list_games or args.replay is not None:
+        records = list(GAME_LOG.records())
+        if args.list_games:
+            for number, record in enumerate(records, start=1):
+                print(f"{number:5}  {record.describe()}")
+            return
+        if not records:
+            parser.error("no games have been recorded")
+        number = args.replay
+        if not (1 <= number <= len(records) or -len(records) <= number < 0):
+            parser.error(f"--replay takes 1 to {len(records)} or a "
+                         "negative number counting from the end")
+        replay_game(records[number - 1 if number > 0 else number],
+                    args.replay_delay)
+        return
+
+    if args.export_games:
+        count = export_games(args.export_games)
+        print(f"Exported {count} games", file=sys.stderr)
+        return
+
+    if args.import_games:
+        count = import_games(args.import_games)
+        print(f"Imported {count} games into {GAME_LOG.path}")
+        return
+
+    if args.build_book:
+        count = build_opening_book(args.build_book, args.book_plies,
+                                   args.book_depth, rows=args.rows,
+                                   cols=args.cols, connect=args.connect)
+        print(f"Wrote {count} positions to {args.build_book}")
+        return
+
+    if args.self_play:
+        first, second = (get_move_provider(name) for name in args.players)
+        report = run_self_play(first, second, args.self_play,
+                               args.processes, args.seed, rows=args.rows,
+                               cols=args.cols, connect=args.connect)
+        print_self_play_report(report, args.players)
+        return
+
+    if args.pooled:
+        run_pooled_sessions()
+        return
+
     run_game()
 
 
-# Main menu
+# Main program execution
+
+if __name__ == "__main__":
+    """
+    Entry point for the Connect Four game.
 
-"""
-Displays the main menu of the Connect Four game and handles user input
-for game options.
-"""
-main_menu()
+    When the script is run directly (not imported as a module in
+    another script), this block is executed. It calls the main
+    function, which starts the game loop unless another mode was
+    requested on the command line.
+    """
+    main()
@@ -0,0 +1,182 @@
+"""
+An in-memory stand-in for the Hall of Fame worksheet, so the Hall of
+Fame can be tested and benchmarked without network access or
+credentials.
+"""
+
+import threading
+
+
+# A1 notation
+
+
+def a1_to_rowcol(label):
+    """
+    Converts a cell label in A1 notation into row and column numbers.
+
+    Args:
+        label (str): A cell label such as 'B12'.
+
+    Returns:
+        tuple: The row and column, both counted from 1.
+    """
+    letters = label.rstrip("0123456789")
+    col = 0
+    for letter in letters.upper():
+        col = col * 26 + ord(letter) - ord("A") + 1
+    return int(label[len(letters):]), col
+
+
+# Class FakeSheet
+
+
+class FakeSheet:
+    """
+    An in-memory stand-in for a gspread worksheet.
+
+    It implements the worksheet methods the game uses.
+
+    Attributes:
+        values (list of lists): The cell values, row by row, starting
+        with the header row.
+        requests (int): Number of calls made, one per API request the
+        real worksheet would send.
+        lock (threading.Lock): Makes every request atomic, like one
+        request to the real worksheet, so parallel sessions can share
+        the sheet.
+    """
+
+    def __init__(self, values=None):
+        """
+        Initializes the sheet.
+
+        Args:
+            values (list of lists): Initial cell values, defaults to the
+            Hall of Fame header row only.
+        """
+        if values is None:
+            values = [["player_name", "games_won", "games_lost"]]
+        self.values = [list(row) for row in values]
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def get_all_values(self):
+        """
+        Returns every cell value as a list of rows.
+        """
+        with self.lock:
+            self.requests += 1
+            return [[str(value) for value in row] for row in self.values]
+
+    def get_all_records(self):
+        """
+        Returns every row after the header as a dictionary.
+        """
+        with self.lock:
+            self.requests += 1
+            header = self.values[0]
+            return [dict(zip(header, row)) for row in self.values[1:]]
+
+    def row_values(self, row):
+        """
+        Returns the values of a row, counted from 1.
+        """
+        with self.lock:
+            self.requests += 1
+            return [str(value) for value in self.values[row - 1]]
+
+    def col_values(self, col):
+        """
+        Returns the values of a column, counted from 1.
+        """
+        with self.lock:
+            self.requests += 1
+            return [str(row[col - 1])
+                    for row in self.values if len(row) >= col]
+
+    def find(self, query):
+        """
+        Returns the first cell whose value equals 'query', or None.
+        """
+        with self.lock:
+            self.requests += 1
+            for row_number, row in enumerate(self.values, start=1):
+                for col_number, value in enumerate(row, start=1):
+                    if str(value) == query:
+                        from gspread.cell import Cell
+                        return Cell(row_number, col_number, str(value))
+            return None
+
+    def append_row(self, values):
+        """
+        Adds a row after the last one.
+        """
+        with self.lock:
+            self.requests += 1
+            self.values.append(list(values))
+
+    def append_rows(self, values, insert_data_option=None):
+        """
+        Adds several rows after the last one. They are always inserted
+        as new rows, whatever 'insert_data_option' says.
+        """
+        with self.lock:
+            self.requests += 1
+            self.values.extend(list(row) for row in values)
+
+    def update_cell(self, row, col, value):
+        """
+        Sets the value of one cell, counted from 1.
+        """
+        with self.lock:
+            self.requests += 1
+            self._set(row, col, value)
+
+    def batch_get(self, ranges):
+        """
+        Returns the values of several A1 ranges in one request.
+
+        Args:
+            ranges (list): Ranges such as 'A2:C2'.
+
+        Returns:
+            list: The rows of values of each range.
+        """
+        with self.lock:
+            self.requests += 1
+            result = []
+            for cell_range in ranges:
+                first, _, last = cell_range.partition(":")
+                top, left = a1_to_rowcol(first)
+                bottom, right = a1_to_rowcol(last or first)
+                result.append([[str(value) for value in row[left - 1:right]]
+                               for row in self.values[top - 1:bottom]])
+            return result
+
+    def batch_update(self, data):
+        """
+        Sets the values of several A1 ranges in one request.
+
+        Args:
+            data (list): Dictionaries with a 'range' such as 'B2:C2' and
+            the 'values' to write into it.
+        """
+        with self.lock:
+            self.requests += 1
+            for update in data:
+                first = update["range"].split(":")[0]
+                row, col = a1_to_rowcol(first)
+                for row_offset, row_values in enumerate(update["values"]):
+                    for col_offset, value in enumerate(row_values):
+                        self._set(row + row_offset, col + col_offset, value)
+
+    def _set(self, row, col, value):
+        """
+        Sets a cell value, growing the sheet when needed.
+        """
+        while len(self.values) < row:
+            self.values.append([])
+        cells = self.values[row - 1]
+        while len(cells) < col:
+            cells.append("")
+        cells[col - 1] = value
@@ -0,0 +1,91 @@
+"""
+Tests of the NumPy batch win detection against the 'Board' reference.
+
+Run with 'python -m unittest' from the project folder.
+"""
+
+import random
+import unittest
+
+import run
+
+
+SIZES = [(6, 7, 4), (5, 5, 3), (4, 10, 4), (8, 9, 5), (7, 6, 4), (3, 3, 3)]
+
+
+def random_boards(rows, cols, connect, count=200, seed=0):
+    """
+    Returns boards filled with a random number of random moves. The
+    moves go on after a line is made, so both players can have one.
+    """
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        board = run.Board(rows, cols, connect)
+        pieces = (run.PLAYER_PIECE, run.COMPUTER_PIECE)
+        for turn in range(rng.randint(0, rows * cols)):
+            col = rng.choice([col for col in range(cols)
+                              if board.is_valid_location(col)])
+            board.add_piece(board.get_next_open_row(col), col,
+                            pieces[turn % 2])
+        boards.append(board)
+    return boards
+
+
+@unittest.skipIf(run.import_numpy() is None, "NumPy is not installed")
+class BatchCheckWinsTest(unittest.TestCase):
+
+    def test_matches_board_check_win(self):
+        for rows, cols, connect in SIZES:
+            boards = random_boards(rows, cols, connect)
+            result = run.batch_check_wins(run.stack_boards(boards), connect)
+            for number, board in enumerate(boards):
+                first = board.check_win(run.PLAYER_PIECE)
+                second = board.check_win(run.COMPUTER_PIECE)
+                with self.subTest(size=(rows, cols, connect), board=number):
+                    self.assertEqual(bool(result["win"][number]), first)
+                    self.assertEqual(bool(result["loss"][number]), second)
+                    self.assertEqual(bool(result["draw"][number]),
+                                     board.is_full() and not first
+                                     and not second)
+
+    def test_lines_hold_the_winners_pieces(self):
+        for rows, cols, connect in SIZES:
+            boards = random_boards(rows, cols, connect, seed=1)
+            result = run.batch_check_wins(run.stack_boards(boards), connect)
+            for number, board in enumerate(boards):
+                line = result["lines"][number].tolist()
+                if result["win"][number]:
+                    piece = run.PLAYER_PIECE
+                elif result["loss"][number]:
+                    piece = run.COMPUTER_PIECE
+                else:
+                    self.assertEqual(line, [[-1, -1]] * connect)
+                    continue
+                with self.subTest(size=(rows, cols, connect), board=number):
+                    self.assertEqual(len({tuple(cell) for cell in line}),
+                                     connect)
+                    for row, col in line:
+                        self.assertEqual(board.cell(row, col), piece)
+
+
+class EvaluatePositionsTest(unittest.TestCase):
+
+    def test_matches_board_check_win(self):
+        for rows, cols, connect in SIZES:
+            boards = random_boards(rows, cols, connect, seed=2)
+            expected = [0 if board.check_win(run.PLAYER_PIECE)
+                        else 1 if board.check_win(run.COMPUTER_PIECE)
+                        else None for board in boards]
+            with self.subTest(size=(rows, cols, connect)):
+                self.assertEqual(run.evaluate_positions(boards), expected)
+
+    def test_self_play_results_agree(self):
+        report = run.run_self_play(run.random_move, run.random_move,
+                                   games=20, processes=1, rows=5, cols=8,
+                                   connect=3)
+        self.assertEqual(report["mismatches"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
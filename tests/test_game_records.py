@@ -0,0 +1,83 @@
+"""
+Tests of parsing game records written to and imported into the log.
+
+Run with 'python -m unittest' from the project folder.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import run
+
+
+def record_line(**fields):
+    """
+    Returns the JSON line of a short 6x7 game, with 'fields' replaced.
+    """
+    data = {"players": ["Ann", "Computer"], "pieces": [1, 3], "rows": 6,
+            "cols": 7, "connect": 4, "moves": "0101010", "started": 1.0,
+            "finished": 2.0, "result": "win", "winner": 0,
+            "difficulty": "easy"}
+    data.update(fields)
+    return json.dumps(data) + "\n"
+
+
+class GameRecordTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        record = run.GameRecord.from_line(record_line())
+        self.assertEqual(record.to_line(), run.GameRecord.from_line(
+            record.to_line()).to_line())
+        self.assertEqual(record.columns(), [0, 1, 0, 1, 0, 1, 0])
+
+    def test_rejects_illegal_moves(self):
+        lines = [
+            record_line(moves="0107"),
+            record_line(moves="01z"),
+            record_line(moves="0000000"),
+            record_line(rows=2, moves="000"),
+            record_line(moves=[0, 1]),
+        ]
+        for line in lines:
+            with self.subTest(line=line):
+                with self.assertRaises(ValueError):
+                    run.GameRecord.from_line(line)
+
+    def test_rejects_bad_fields(self):
+        lines = [
+            "[]",
+            record_line(players=5),
+            record_line(rows=0),
+            record_line(cols=21),
+            record_line(connect=9),
+            record_line(rows="6"),
+            record_line(result="lost"),
+        ]
+        for line in lines:
+            with self.subTest(line=line):
+                with self.assertRaises(ValueError):
+                    run.GameRecord.from_line(line)
+
+    def test_wide_boards_use_letters(self):
+        record = run.GameRecord.from_line(
+            record_line(rows=3, cols=12, moves="ab0b"))
+        self.assertEqual(record.columns(), [10, 11, 0, 11])
+
+    def test_import_skips_illegal_records(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        source = os.path.join(folder.name, "import.jsonl")
+        with open(source, "w", encoding="utf-8") as file:
+            file.write(record_line() + record_line(moves="0000000")
+                       + record_line(moves="9") + record_line(moves="6"))
+        log = run.GameLog(os.path.join(folder.name, "games.jsonl"))
+        self.assertEqual(run.import_games(source, log), 2)
+        log.flush()
+        self.assertEqual([record.moves for record in log.records()],
+                         ["0101010", "6"])
+
+
+if __name__ == "__main__":
+    unittest.main()
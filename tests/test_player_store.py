@@ -0,0 +1,252 @@
+"""
+Tests of the Hall of Fame cache against the in-memory 'FakeSheet'.
+
+Run with 'python -m unittest' from the project folder.
+"""
+
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+
+import run
+from tests.fake_sheet import FakeSheet
+
+
+HEADER = ["player_name", "games_won", "games_lost"]
+
+
+def sheet_counts(sheet):
+    """
+    Returns the counts in a sheet as a dictionary of normalized names,
+    adding up the rows of each player.
+    """
+    players = run.HallOfFameCache.read_sheet(sheet.get_all_values())
+    return {key: record[1:] for key, record in players.items()}
+
+
+class FailingSheet(FakeSheet):
+    """
+    A 'FakeSheet' whose chosen methods raise 'OSError' until 'fail' is
+    cleared.
+    """
+
+    def __init__(self, values=None, fail=()):
+        super().__init__(values)
+        self.fail = set(fail)
+
+    def get_all_values(self):
+        if "get_all_values" in self.fail:
+            raise OSError("get_all_values failed")
+        return super().get_all_values()
+
+    def append_rows(self, values, insert_data_option=None):
+        if "append_rows" in self.fail:
+            raise OSError("append_rows failed")
+        return super().append_rows(values, insert_data_option)
+
+
+class SlowSheet(FakeSheet):
+    """
+    A 'FakeSheet' whose requests take a while, like requests over the
+    network, so requests of parallel sessions interleave.
+    """
+
+    def __getattribute__(self, name):
+        attribute = super().__getattribute__(name)
+        if callable(attribute) and not name.startswith("_"):
+            time.sleep(0.01)
+        return attribute
+
+
+class FakeSheetTest(unittest.TestCase):
+
+    def test_reads_and_writes(self):
+        sheet = FakeSheet([HEADER, ["Ann", 1, 2]])
+        sheet.append_rows([["Bob", 0, 0]], insert_data_option="INSERT_ROWS")
+        sheet.batch_update([{"range": "B3:C3", "values": [[4, 5]]}])
+        self.assertEqual(sheet.get_all_values()[2], ["Bob", "4", "5"])
+        self.assertEqual(sheet.col_values(1), ["player_name", "Ann", "Bob"])
+        self.assertEqual(sheet.batch_get(["A2:C2", "B3:C3"]),
+                         [[["Ann", "1", "2"]], [["4", "5"]]])
+        self.assertEqual(sheet.requests, 5)
+
+    def test_find_matches_whole_cells(self):
+        sheet = FakeSheet([HEADER, ["Ann", 10, 2]])
+        self.assertIsNone(sheet.find("An"))
+
+
+class HallOfFameCacheTest(unittest.TestCase):
+
+    def test_parallel_sessions_lose_no_update(self):
+        sheet = FakeSheet([HEADER, ["Ann", 3, 1], ["Bob", 0, 0]])
+        cache = run.HallOfFameCache(sheet)
+        names = ["Ann", "bob", "Cid", "dee", "Eve", "cid"]
+        expected = {"ann": [3, 1], "bob": [0, 0]}
+        expected_lock = threading.Lock()
+
+        def session(seed):
+            rng = random.Random(seed)
+            for _ in range(200):
+                name = rng.choice(names)
+                record = cache.find(name)
+                key = record[0] if record else cache.add(name)
+                won = rng.random() < 0.5
+                cache.increment(key, won)
+                with expected_lock:
+                    counts = expected.setdefault(run.normalize_name(name),
+                                                 [0, 0])
+                    counts[0 if won else 1] += 1
+                if rng.random() < 0.2:
+                    cache.flush_in_background()
+                elif rng.random() < 0.05:
+                    cache.flush()
+
+        threads = [threading.Thread(target=session, args=(seed,))
+                   for seed in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        cache.flush_in_background().join()
+        cache.flush()
+
+        self.assertEqual(sheet_counts(sheet), expected)
+        for key, (won, lost) in expected.items():
+            self.assertEqual(cache.find(key)[1][1:], [won, lost])
+
+    def test_caches_flushing_at_once_add_up(self):
+        sheet = SlowSheet([HEADER, ["Ann", 1, 1]])
+        caches = [run.HallOfFameCache(sheet) for _ in range(8)]
+        for cache in caches:
+            cache.load()
+        barrier = threading.Barrier(len(caches))
+
+        def session(cache):
+            cache.increment(cache.find("ann")[0], True)
+            record = cache.find("Zed")
+            cache.increment(record[0] if record else cache.add("Zed"),
+                            False)
+            barrier.wait()
+            cache.flush()
+
+        threads = [threading.Thread(target=session, args=(cache,))
+                   for cache in caches]
+        sheet.values.insert(1, ["Intruder", "0", "0"])
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sheet_counts(sheet), {"intruder": [0, 0],
+                                               "ann": [9, 1],
+                                               "zed": [0, 8]})
+        reloaded = run.HallOfFameCache(sheet)
+        self.assertEqual(reloaded.find("ZED")[1], ["Zed", 0, 8])
+
+    def test_failed_flush_is_written_by_next_flush(self):
+        sheet = FailingSheet([HEADER, ["Ann", 1, 0]], fail={"append_rows"})
+        cache = run.HallOfFameCache(sheet)
+        cache.increment(cache.find("ann")[0], True)
+        cache.add("New")
+        with self.assertRaises(OSError):
+            cache.flush()
+        self.assertEqual(cache.pending, {"ann": ["Ann", 1, 0],
+                                         "new": ["New", 0, 0]})
+        self.assertEqual(len(sheet.values), 2)
+
+        sheet.fail.clear()
+        cache.increment("ann", False)
+        cache.flush()
+        self.assertEqual(sheet_counts(sheet), {"ann": [2, 1], "new": [0, 0]})
+        self.assertEqual(cache.pending, {})
+        self.assertEqual(cache.flush(), 0)
+
+    def test_failed_flush_is_saved_to_offline_queue(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        path = os.path.join(folder.name, "queue.jsonl")
+        sheet = FailingSheet([HEADER, ["Ann", 1, 0]], fail={"append_rows"})
+        cache = run.HallOfFameCache(sheet, run.OfflineQueue(path))
+        cache.increment(cache.find("ann")[0], True)
+        with self.assertRaises(OSError):
+            cache.flush()
+        self.assertEqual(cache.pending, {})
+        self.assertTrue(os.path.exists(path))
+
+        sheet.fail.clear()
+        replay = run.HallOfFameCache(sheet, run.OfflineQueue(path))
+        replay.flush()
+        self.assertEqual(sheet_counts(sheet), {"ann": [2, 0]})
+        self.assertEqual(replay.find("ann")[1], ["Ann", 2, 0])
+        self.assertFalse(os.path.exists(path))
+
+    def test_reload_offline_keeps_queued_results(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        queue = run.OfflineQueue(os.path.join(folder.name, "queue.jsonl"))
+        sheet = FailingSheet([HEADER, ["Ann", 1, 0]],
+                             fail={"get_all_values", "append_rows"})
+        cache = run.HallOfFameCache(sheet, queue)
+        key, record = cache.find("Ann")
+        self.assertTrue(cache.offline)
+        cache.increment(key, True)
+        with self.assertRaises(OSError):
+            cache.reload()
+        self.assertEqual(cache.pending, {})
+        self.assertEqual(cache.find("ann")[1], ["Ann", 1, 0])
+        self.assertEqual(cache.leaderboard()["players"][0]["games_won"], 1)
+
+        sheet.fail.discard("get_all_values")
+        with self.assertRaises(OSError):
+            cache.reload()
+        self.assertFalse(cache.offline)
+        self.assertEqual(cache.find("ann")[1], ["Ann", 2, 0])
+
+        sheet.fail.clear()
+        cache.reload()
+        self.assertEqual(sheet_counts(sheet), {"ann": [2, 0]})
+        self.assertEqual(cache.find("ann")[1], ["Ann", 2, 0])
+        self.assertFalse(queue)
+
+
+class SheetSchedulerTest(unittest.TestCase):
+
+    def test_burst_is_small(self):
+        scheduler = run.SheetScheduler(FakeSheet())
+        self.assertEqual(scheduler.bucket.capacity, run.SHEETS_BURST)
+
+    def test_cache_works_offline_until_sheet_opens(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        sheet = FakeSheet([HEADER, ["Ann", 1, 0]])
+        attempts = []
+
+        def open_sheet():
+            attempts.append(1)
+            if len(attempts) <= 3:
+                raise ConnectionError("no connection")
+            return sheet
+
+        scheduler = run.SheetScheduler(requests_per_minute=6000,
+                                       retries=2, base_delay=0,
+                                       open_sheet=open_sheet)
+        cache = run.HallOfFameCache(
+            scheduler, run.OfflineQueue(os.path.join(folder.name, "q")))
+        key, record = cache.find("Ann")
+        self.assertTrue(cache.offline)
+        self.assertEqual(record, ["Ann", 0, 0])
+        self.assertEqual(len(attempts), 3)
+        cache.increment(key, True)
+
+        cache.flush()
+        self.assertEqual(len(attempts), 4)
+        self.assertFalse(cache.offline)
+        self.assertEqual(sheet_counts(sheet), {"ann": [2, 0]})
+        self.assertEqual(cache.find("ann")[1], ["Ann", 2, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()